@@ -0,0 +1,437 @@
+# benchmark.py
+"""
+Reproducible benchmarks for Slide Chooser's hot paths, run headless against slide_core.
+
+A synthetic master folder of the requested shape (batch folders x images, mixed PNG and
+JPEG at several resolutions) is generated once and reused. Each benchmark maps to a GUI
+code path:
+
+    scan_cold / scan_warm   SlideChooser.scan_master_folder (without / with the catalog index)
+    display_cold            display_image_in_frame on a fresh install (decode originals)
+    display_thumbnails      display_image_in_frame after a restart (persistent thumbnail store)
+    display_memory          display_image_in_frame with the pyramid cache warm
+    resize_preview          on_slide_resize painting fast previews during a live drag
+    resize                  refine_after_resize re-rendering the view at new sizes
+    navigate_burst          holding an arrow key in navigate_sequence
+    metadata_index          the background header probe on a fresh index (every image)
+    metadata_index_warm     the same with nothing changed (one stat per image)
+    similarity_index        the background similarity indexer on a fresh index
+    similarity_index_warm   the same with nothing changed (one stat per image)
+    export_zip / export_copy / export_link / export_transcode
+                            export_selected in each File > Export As mode (WebP for transcode)
+    startup_import          importing slide_chooser in a fresh interpreter (cold start before Tk, median)
+    startup_window          SlideChooser start-up until its window is shown (median; needs a display,
+                            e.g. under xvfb-run, and is skipped without one)
+
+Results are written as JSON; pass --compare with an earlier result file to flag regressions.
+
+    python benchmark.py --shape 10x100 --output results.json
+    python benchmark.py --shape 40x2000 --compare results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import slide_core
+
+# Resolutions of the generated images (cycled through by image index)
+DEFAULT_IMAGE_SIZES = "1024x1024,2048x1152,3840x2160"
+# Distinct encoded images per (format, size); files are copies of these
+VARIANTS_PER_KIND = 4
+# Window sizes cycled through by the resize benchmark
+RESIZE_BOXES = [(400, 400), (520, 520), (640, 640), (760, 760), (880, 880)]
+VIEW_BOX = (560, 560)  # Per-slide box for a 3-slide view in the default 1200x800 window
+SLIDES = 3
+
+
+def parse_pair(text):
+    """Parse "AxB" into a tuple of two ints"""
+    a, _, b = text.lower().partition("x")
+    return int(a), int(b)
+
+
+def make_variant(size, fmt, seed):
+    """Encode a synthetic image with some structure, so codecs do realistic work"""
+    from PIL import Image, ImageDraw, ImageFilter
+    rng = random.Random(seed)
+    small = Image.effect_noise((size[0] // 16, size[1] // 16), 64).convert("RGB")
+    img = small.resize(size, Image.Resampling.BILINEAR).filter(ImageFilter.GaussianBlur(2))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        r = rng.randrange(8, max(9, size[0] // 6))
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    img.save(buffer, fmt, **({"quality": 90} if fmt == "JPEG" else {"compress_level": 1}))
+    return buffer.getvalue()
+
+
+def generate_master_folder(root, folders, images, sizes, missing, seed=1):
+    """Create (or reuse) a synthetic master folder and return its path"""
+    shape = {"folders": folders, "images": images, "sizes": sizes, "missing": missing, "seed": seed}
+    master = os.path.join(root, f"master_{folders}x{images}")
+    marker = os.path.join(master, ".benchmark.json")
+    try:
+        with open(marker) as f:
+            if json.load(f) == shape:
+                return master
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(master, ignore_errors=True)
+
+    size_list = [parse_pair(s) for s in sizes.split(",")]
+    variants = {}
+    for fmt, ext in (("PNG", ".png"), ("JPEG", ".jpg")):
+        for size in size_list:
+            variants[(ext, size)] = [make_variant(size, fmt, seed + i) for i in range(VARIANTS_PER_KIND)]
+
+    rng = random.Random(seed)
+    for f in range(folders):
+        folder_path = os.path.join(master, f"batch_{f:03d}")
+        os.makedirs(folder_path)
+        for i in range(images):
+            if rng.random() < missing:
+                continue
+            ext = ".png" if i % 2 == 0 else ".jpg"
+            size = size_list[i % len(size_list)]
+            with open(os.path.join(folder_path, f"image_{i:06d}{ext}"), "wb") as out:
+                out.write(variants[(ext, size)][(i + f) % VARIANTS_PER_KIND])
+    with open(marker, "w") as f:
+        json.dump(shape, f)
+    return master
+
+
+class Timer:
+    """Collects benchmark results"""
+
+    def __init__(self):
+        self.results = {}
+
+    def record(self, name, seconds, ops=1, **extra):
+        self.results[name] = {"seconds": round(seconds, 6), "ops": ops,
+                              "per_op_ms": round(1000 * seconds / max(1, ops), 4), **extra}
+        print(f"{name:20s} {seconds:9.3f}s  {ops:7d} ops  {1000 * seconds / max(1, ops):9.3f} ms/op",
+              file=sys.stderr)
+
+
+def fresh_cache_dir(workdir):
+    """Point slide_core at an empty persistent cache directory"""
+    cache_dir = os.path.join(workdir, "cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+    os.environ["SLIDE_CHOOSER_CACHE_DIR"] = cache_dir
+
+
+def view_paths(catalog, names, count):
+    """Paths shown for the first count images, each from the first folder that has it"""
+    return [catalog.path(name, catalog.first_folder(name)) for name in names[:count]]
+
+
+def bench_scan(timer, master):
+    started = time.perf_counter()
+    catalog = slide_core.build_catalog(master)
+    timer.record("scan_cold", time.perf_counter() - started, len(catalog.folders),
+                 images=len(catalog))
+
+    # The catalog index ignores folder mtimes that are too close to the scan time
+    time.sleep(slide_core.RACY_MTIME_NS / 1e9 + 0.1)
+    slide_core.build_catalog(master)
+    started = time.perf_counter()
+    catalog = slide_core.build_catalog(master)
+    timer.record("scan_warm", time.perf_counter() - started, len(catalog.folders))
+    return catalog
+
+
+def bench_display(timer, paths):
+    loader = slide_core.ImageLoader()
+    started = time.perf_counter()
+    for path in paths:
+        loader.render(path, VIEW_BOX)
+    timer.record("display_cold", time.perf_counter() - started, len(paths))
+    # Previews are stored by background jobs; let them finish before timing a restart
+    while loader.decode_pool.busy():
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    for path in paths:
+        loader.render(path, VIEW_BOX)
+    timer.record("display_memory", time.perf_counter() - started, len(paths))
+
+    # A new loader has empty memory caches but shares the persistent thumbnail store
+    restarted = slide_core.ImageLoader()
+    started = time.perf_counter()
+    for path in paths:
+        restarted.render(path, VIEW_BOX)
+    timer.record("display_thumbnails", time.perf_counter() - started, len(paths))
+    return loader
+
+
+def bench_resize(timer, loader, paths):
+    view = paths[:SLIDES]
+    for path in view:
+        loader.get_pyramid(path, (loader.pyramid_max_dim, loader.pyramid_max_dim))
+    started = time.perf_counter()
+    for box in RESIZE_BOXES:
+        for path in view:
+            slide_core.letterbox(loader.preview(path, box), box, "black")
+    timer.record("resize_preview", time.perf_counter() - started, len(RESIZE_BOXES))
+    started = time.perf_counter()
+    for box in RESIZE_BOXES:
+        for path in view:
+            loader.render(path, box)
+    timer.record("resize", time.perf_counter() - started, len(RESIZE_BOXES))
+
+
+def bench_navigate(timer, paths, keypresses):
+    """Request every view of a rapid arrow-key burst and time until the final view arrives"""
+    loader = slide_core.ImageLoader()
+    scheduler = slide_core.LoadScheduler()
+    delivered = {}
+    settled = threading.Event()
+    final_keys = {}  # Structure: {slot: job key} for the last view of the burst
+    lock = threading.Lock()
+
+    def job(path, box):
+        key = (path, box[0], box[1])
+        if not scheduler.claim(key):
+            return
+        img = loader.render(path, box)
+        if not scheduler.claim(key, decoded=True):
+            return
+        with lock:
+            for slot in scheduler.finish(key):
+                delivered[slot] = (key, img)
+            if final_keys and all(delivered.get(slot, (None,))[0] == key
+                                  for slot, key in final_keys.items()):
+                settled.set()
+
+    positions = min(keypresses, max(1, len(paths) - SLIDES))
+    started = time.perf_counter()
+    for position in range(positions):
+        keys = [(paths[position + slot], VIEW_BOX[0], VIEW_BOX[1]) for slot in range(SLIDES)]
+        if position == positions - 1:
+            with lock:
+                final_keys.update(enumerate(keys))
+        for slot, key in enumerate(keys):
+            if scheduler.request(slot, key) is not None:
+                loader.decode_pool.submit(job, key[0], VIEW_BOX)
+    is_settled = settled.wait(timeout=120)
+    timer.record("navigate_burst", time.perf_counter() - started, positions, settled=is_settled,
+                 dropped_before_decode=scheduler.dropped_before_decode,
+                 dropped_after_decode=scheduler.dropped_after_decode)
+
+
+def bench_export(timer, workdir, catalog, limit, transcode_limit):
+    names = sorted(catalog.names())[:limit]
+    items = slide_core.selection_items(catalog, {name: catalog.folders[catalog.first_folder(name)]
+                                                 for name in names})
+    total_bytes = sum(os.path.getsize(path) for _, path in items)
+    out_zip = os.path.join(workdir, "export.zip")
+    started = time.perf_counter()
+    slide_core.export_zip(items, out_zip)
+    elapsed = time.perf_counter() - started
+    timer.record("export_zip", elapsed, len(items), mb_per_s=round(total_bytes / 2**20 / elapsed, 2))
+    os.remove(out_zip)
+
+    out_dir = os.path.join(workdir, "export_copy")
+    for method in ("copy", "link"):
+        shutil.rmtree(out_dir, ignore_errors=True)
+        started = time.perf_counter()
+        slide_core.export_copy(items, out_dir, method=method)
+        elapsed = time.perf_counter() - started
+        timer.record(f"export_{method}", elapsed, len(items), mb_per_s=round(total_bytes / 2**20 / elapsed, 2))
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+    items = items[:transcode_limit]
+    started = time.perf_counter()
+    slide_core.export_transcoded(items, out_dir, "webp")
+    elapsed = time.perf_counter() - started
+    timer.record("export_transcode", elapsed, len(items))
+    shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def bench_metadata(timer, catalog):
+    versions = sum(len(catalog.versions(name)) for name in catalog.names())
+    index = slide_core.MetadataIndex(catalog.master_folder)
+    started = time.perf_counter()
+    index.update(catalog)
+    timer.record("metadata_index", time.perf_counter() - started, versions,
+                 workers=slide_core.DEFAULT_METADATA_WORKERS)
+    started = time.perf_counter()
+    index.update(catalog)
+    timer.record("metadata_index_warm", time.perf_counter() - started, versions)
+
+
+def bench_similarity(timer, catalog, limit):
+    names = sorted(catalog.names())[:limit]
+    versions = sum(len(catalog.versions(name)) for name in names)
+    index = slide_core.SimilarityIndex(catalog.master_folder)
+    started = time.perf_counter()
+    index.update(catalog, names)
+    timer.record("similarity_index", time.perf_counter() - started, versions,
+                 workers=slide_core.DEFAULT_SIMILARITY_WORKERS)
+    started = time.perf_counter()
+    index.update(catalog, names)
+    timer.record("similarity_index_warm", time.perf_counter() - started, versions)
+
+
+def bench_startup(timer, runs):
+    """Time importing the GUI module in fresh interpreters, net of bare interpreter start-up (median)"""
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def run(code):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=package_dir, check=True)
+        return time.perf_counter() - started
+
+    run("import slide_chooser")  # Writes the bytecode cache, as any earlier launch would have
+    bare = min(run("pass") for _ in range(runs))
+    imports = [run("import slide_chooser") - bare for _ in range(runs)]
+    # The median, so one slow launch does not skew it
+    timer.record("startup_import", statistics.median(imports), runs=runs,
+                 mean_ms=round(1000 * statistics.mean(imports), 3), interpreter_ms=round(1000 * bare, 3))
+
+
+STARTUP_WINDOW_CODE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import slide_chooser
+app = slide_chooser.SlideChooser()
+def finished():
+    if app.startup_ms is None:
+        app.after(5, finished)
+    else:
+        print(*app.startup_ms)
+        app.destroy()
+app.after(5, finished)
+app.mainloop()
+app.shutdown()
+"""
+
+
+def display_available():
+    """Whether Tk can open a window here"""
+    import tkinter
+    try:
+        tkinter.Tk().destroy()
+    except tkinter.TclError:
+        return False
+    return True
+
+
+def bench_startup_window(timer, workdir, runs):
+    """Time launching the GUI until its window is shown and until the UI is ready, in fresh interpreters (median)"""
+    if not display_available():
+        print("startup_window       skipped: no display (run under xvfb-run to measure it)", file=sys.stderr)
+        return
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, SLIDE_CHOOSER_REOPEN="0")
+    shown, ready = [], []
+    for _ in range(runs):
+        # Run from the work directory, which receives the application's log file
+        output = subprocess.run([sys.executable, "-c", STARTUP_WINDOW_CODE, package_dir], cwd=workdir, env=env,
+                                check=True, capture_output=True, text=True).stdout.split()
+        shown.append(float(output[0]) / 1000)
+        ready.append(float(output[1]) / 1000)
+    timer.record("startup_window", statistics.median(shown), runs=runs,
+                 ready_ms=round(1000 * statistics.median(ready), 3))
+
+
+def compare(results, baseline_path, tolerance):
+    """Print benchmarks that got slower than the baseline by more than tolerance; return their count"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    for name, result in results.items():
+        old = baseline.get(name)
+        if not old or not old["per_op_ms"]:
+            continue
+        ratio = result["per_op_ms"] / old["per_op_ms"]
+        flag = "REGRESSION" if ratio > 1 + tolerance else "ok"
+        regressions += flag != "ok"
+        print(f"{name:20s} {old['per_op_ms']:9.3f} -> {result['per_op_ms']:9.3f} ms/op  x{ratio:5.2f}  {flag}",
+              file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Slide Chooser's hot paths")
+    parser.add_argument("--shape", default="10x100", help="batch folders x images per folder (default 10x100)")
+    parser.add_argument("--sizes", default=DEFAULT_IMAGE_SIZES, help="comma-separated image resolutions")
+    parser.add_argument("--missing", type=float, default=0.02, help="fraction of images missing per folder")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "slide_chooser_bench"),
+                        help="where synthetic data is generated and kept between runs")
+    parser.add_argument("--display-count", type=int, default=24, help="images decoded by display benchmarks")
+    parser.add_argument("--keypresses", type=int, default=200, help="arrow-key presses in the navigation burst")
+    parser.add_argument("--export-count", type=int, default=500, help="images exported")
+    parser.add_argument("--transcode-count", type=int, default=50, help="images exported as resized WebP")
+    parser.add_argument("--similarity-count", type=int, default=200, help="image names analysed by the similarity index")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters timed importing and launching the GUI")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    folders, images = parse_pair(args.shape)
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"Preparing {folders}x{images} master folder in {args.workdir}...", file=sys.stderr)
+    master = generate_master_folder(args.workdir, folders, images, args.sizes, args.missing)
+    fresh_cache_dir(args.workdir)
+
+    timer = Timer()
+    catalog = bench_scan(timer, master)
+    names = sorted(catalog.names())
+    paths = view_paths(catalog, names, max(args.display_count, args.keypresses + SLIDES))
+    loader = bench_display(timer, paths[:args.display_count])
+    bench_resize(timer, loader, paths)
+    fresh_cache_dir(args.workdir)
+    bench_navigate(timer, paths, args.keypresses)
+    bench_export(timer, args.workdir, catalog, args.export_count, args.transcode_count)
+    bench_metadata(timer, catalog)
+    bench_similarity(timer, catalog, args.similarity_count)
+    bench_startup(timer, args.startup_runs)
+    bench_startup_window(timer, args.workdir, args.startup_runs)
+
+    from PIL import __version__ as pillow_version
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": pillow_version,
+            "numpy": numpy_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "shape": {"folders": folders, "images": images, "sizes": args.sizes, "missing": args.missing},
+        },
+        "results": timer.results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+
+    if args.compare:
+        return 1 if compare(timer.results, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
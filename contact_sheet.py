@@ -0,0 +1,249 @@
+# contact_sheet.py
+"""
+Contact sheet window for whole-batch triage: a scrollable grid with one row per image
+name and one column per batch folder.
+
+The grid is virtualized: only cells inside the viewport (plus a small margin) have canvas
+items, and only those cells request thumbnails. Cells that scroll out of view are deleted
+and their pending loads cancelled, so memory and decode work stay bounded however large
+the catalog is.
+"""
+import tkinter as tk
+from tkinter import ttk
+from PIL import ImageTk
+
+from slide_core import THUMBNAIL_BUCKETS, letterbox
+
+# Thumbnail box and the spacing between cells, in pixels
+THUMB_SIZE = 96
+CELL_PAD = 8
+CELL = THUMB_SIZE + CELL_PAD
+NAME_COLUMN_WIDTH = 200
+HEADER_HEIGHT = 24
+
+# Rows and columns rendered beyond the viewport, so short scrolls show content at once
+OVERSCAN = 1
+
+BACKGROUND = "#202020"
+CELL_BACKGROUND = "#303030"
+SELECTED_OUTLINE = "#2a7fff"
+MISSING_TEXT = "#777777"
+
+
+class ContactSheet(tk.Toplevel):
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+        self.title("Contact Sheet")
+        self.geometry("1100x750")
+
+        self.cells = {}        # Structure: {(row, col): [rect_id, item_id, buffer]}
+        self.free_buffers = []  # PhotoImages of cells that scrolled away, reused for new cells
+        self.row_labels = {}   # Structure: {row: text_id}
+        self.col_labels = {}   # Structure: {col: text_id}
+        self._render_pending = None
+
+        self.create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.refresh()
+
+    def create_widgets(self):
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(1, weight=1)
+
+        self.header = tk.Canvas(self, height=HEADER_HEIGHT, highlightthickness=0)
+        self.header.grid(row=0, column=1, sticky="ew")
+        self.names = tk.Canvas(self, width=NAME_COLUMN_WIDTH, highlightthickness=0)
+        self.names.grid(row=1, column=0, sticky="ns")
+        self.canvas = tk.Canvas(self, highlightthickness=0, background=BACKGROUND,
+                                xscrollincrement=CELL // 2, yscrollincrement=CELL // 2)
+        self.canvas.grid(row=1, column=1, sticky="nsew")
+        self.names.configure(yscrollincrement=CELL // 2)
+        self.header.configure(xscrollincrement=CELL // 2)
+
+        self.xscroll = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.xview)
+        self.xscroll.grid(row=2, column=1, sticky="ew")
+        self.yscroll = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.yscroll.grid(row=1, column=2, sticky="ns")
+        self.canvas.configure(xscrollcommand=self.on_xscroll, yscrollcommand=self.on_yscroll)
+
+        self.status_var = tk.StringVar(value="Click a thumbnail to select that version; double-click to open it")
+        ttk.Label(self, textvariable=self.status_var, anchor=tk.W).grid(row=3, column=0, columnspan=3, sticky="ew",
+                                                                        padx=5, pady=2)
+
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Double-Button-1>", self.on_double_click)
+        for widget in (self.canvas, self.names):
+            widget.bind("<MouseWheel>", lambda e: self.on_mousewheel(e, self.yview))
+            widget.bind("<Shift-MouseWheel>", lambda e: self.on_mousewheel(e, self.xview))
+            widget.bind("<Button-4>", lambda e: self.yview("scroll", -2, "units"))
+            widget.bind("<Button-5>", lambda e: self.yview("scroll", 2, "units"))
+
+    def on_mousewheel(self, event, view):
+        """Scroll two units per wheel notch (Windows reports 120 per notch, macOS 1)"""
+        steps = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        view("scroll", -2 * steps, "units")
+
+    def refresh(self):
+        """Rebuild the grid after the catalog or the image order changed"""
+        for key in list(self.cells):
+            self.drop_cell(key)
+        self.canvas.delete("all")
+        self.names.delete("all")
+        self.header.delete("all")
+        self.row_labels.clear()
+        self.col_labels.clear()
+
+        rows = len(self.app.image_names)
+        cols = len(self.app.folders)
+        self.canvas.configure(scrollregion=(0, 0, cols * CELL, rows * CELL))
+        self.header.configure(scrollregion=(0, 0, cols * CELL, HEADER_HEIGHT))
+        self.names.configure(scrollregion=(0, 0, NAME_COLUMN_WIDTH, rows * CELL))
+        self.schedule_render()
+
+    def close(self):
+        """Cancel outstanding thumbnail loads and close the window"""
+        for key in list(self.cells):
+            self.drop_cell(key)
+        self.app.contact_sheet = None
+        self.destroy()
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+
+    def on_xscroll(self, first, last):
+        self.xscroll.set(first, last)
+        self.header.xview_moveto(first)
+        self.schedule_render()
+
+    def on_yscroll(self, first, last):
+        self.yscroll.set(first, last)
+        self.names.yview_moveto(first)
+        self.schedule_render()
+
+    def schedule_render(self):
+        """Coalesce scroll and resize events into one render when Tk is idle"""
+        if self._render_pending is None:
+            self._render_pending = self.after_idle(self.render)
+
+    def visible_range(self):
+        """(rows, cols) ranges of the cells inside the viewport plus the overscan margin"""
+        x0 = self.canvas.canvasx(0)
+        y0 = self.canvas.canvasy(0)
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        rows = range(max(0, int(y0 // CELL) - OVERSCAN),
+                     min(len(self.app.image_names), int((y0 + height) // CELL) + 1 + OVERSCAN))
+        cols = range(max(0, int(x0 // CELL) - OVERSCAN),
+                     min(len(self.app.folders), int((x0 + width) // CELL) + 1 + OVERSCAN))
+        return rows, cols
+
+    def render(self):
+        """Create items for cells that scrolled into view and drop the ones that left it"""
+        self._render_pending = None
+        rows, cols = self.visible_range()
+
+        for key in [key for key in self.cells if key[0] not in rows or key[1] not in cols]:
+            self.drop_cell(key)
+        for row in [row for row in self.row_labels if row not in rows]:
+            self.names.delete(self.row_labels.pop(row))
+        for col in [col for col in self.col_labels if col not in cols]:
+            self.header.delete(self.col_labels.pop(col))
+
+        catalog = self.app.image_catalog
+        for row in rows:
+            name = self.app.image_names[row]
+            if row not in self.row_labels:
+                self.row_labels[row] = self.names.create_text(
+                    5, row * CELL + CELL // 2, text=name, anchor=tk.W, width=NAME_COLUMN_WIDTH - 10)
+            selected = catalog.folder_index(self.app.selected_images.get(name))
+            for col in cols:
+                if (row, col) not in self.cells:
+                    self.create_cell(row, col, name, col == selected)
+        for col in cols:
+            if col not in self.col_labels:
+                self.col_labels[col] = self.header.create_text(
+                    col * CELL + CELL // 2, HEADER_HEIGHT // 2, text=self.app.folders[col], width=CELL - 4)
+
+    def create_cell(self, row, col, name, selected):
+        """Draw one cell and request its thumbnail"""
+        x = col * CELL + CELL // 2
+        y = row * CELL + CELL // 2
+        half = THUMB_SIZE // 2 + 2
+        rect = self.canvas.create_rectangle(x - half, y - half, x + half, y + half, fill=CELL_BACKGROUND,
+                                            outline=SELECTED_OUTLINE if selected else "", width=3)
+        img_path = self.app.image_catalog.path(name, col)
+        if img_path is None:
+            item = self.canvas.create_text(x, y, text="—", fill=MISSING_TEXT)
+            self.cells[(row, col)] = [rect, item, None]
+            return
+
+        item = self.canvas.create_image(x, y)
+        self.cells[(row, col)] = [rect, item, None]
+        self.app.request_image(("sheet", row, col), img_path, (THUMB_SIZE, THUMB_SIZE),
+                               lambda img: self.show_thumbnail(row, col, item, img),
+                               decode_dim=THUMBNAIL_BUCKETS[0])
+
+    def show_thumbnail(self, row, col, item, img):
+        """Put a loaded thumbnail into its cell, if the cell is still on screen"""
+        cell = self.cells.get((row, col))
+        if cell is None or cell[1] != item:
+            return
+        if img is None:
+            self.canvas.delete(item)
+            cell[1] = self.canvas.create_text(col * CELL + CELL // 2, row * CELL + CELL // 2,
+                                              text="Error", fill=MISSING_TEXT)
+            return
+        if cell[2] is None:
+            cell[2] = self.free_buffers.pop() if self.free_buffers else ImageTk.PhotoImage(
+                "RGB", (THUMB_SIZE, THUMB_SIZE))
+        cell[2].paste(letterbox(img, (THUMB_SIZE, THUMB_SIZE), CELL_BACKGROUND))
+        self.canvas.itemconfigure(item, image=cell[2])
+
+    def drop_cell(self, key):
+        """Delete a cell's items and cancel its pending thumbnail"""
+        rect, item, buffer = self.cells.pop(key)
+        self.canvas.delete(rect)
+        self.canvas.delete(item)
+        if buffer is not None:
+            self.free_buffers.append(buffer)
+        self.app.cancel_image(("sheet",) + key)
+
+    def cell_at(self, event):
+        """(row, col) under a mouse event, or None outside the grid"""
+        row = int(self.canvas.canvasy(event.y) // CELL)
+        col = int(self.canvas.canvasx(event.x) // CELL)
+        if 0 <= row < len(self.app.image_names) and 0 <= col < len(self.app.folders):
+            return row, col
+        return None
+
+    def on_click(self, event):
+        """Select the clicked version of an image"""
+        cell = self.cell_at(event)
+        if cell is None:
+            return
+        row, col = cell
+        name = self.app.image_names[row]
+        if not self.app.image_catalog.has(name, col):
+            return
+        self.app.select_version(name, col)
+        self.update_row_selection(row)
+        self.status_var.set(f"Selected {name} from {self.app.folders[col]}")
+
+    def on_double_click(self, event):
+        """Show the clicked image in the main window"""
+        cell = self.cell_at(event)
+        if cell is not None:
+            self.on_click(event)
+            self.app.jump_to_image(cell[0])
+
+    def update_row_selection(self, row):
+        """Move the selection outline within a row"""
+        selected = self.app.image_catalog.folder_index(self.app.selected_images.get(self.app.image_names[row]))
+        for (cell_row, col), (rect, _, _) in self.cells.items():
+            if cell_row == row:
+                self.canvas.itemconfigure(rect, outline=SELECTED_OUTLINE if col == selected else "")
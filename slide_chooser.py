@@ -1,20 +1,99 @@
 # slide_chooser.py
-import os
+import time
+STARTUP_STARTED = time.perf_counter()  # Startup time is measured from here, imports included
+
 import tkinter as tk
-from tkinter import filedialog, ttk, messagebox
-import shutil
-import zipfile
-from PIL import Image, ImageTk
+from tkinter import filedialog, ttk, messagebox, simpledialog
+import os
+import bisect
 import threading
 import queue
+import itertools
 import logging
-from collections import defaultdict
 
-# Set up logging
-logging.basicConfig(filename='slide_chooser.log', level=logging.INFO,
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+import slide_core
+from slide_core import (
+    DEFAULT_CACHE_BUDGET_MB, DEFAULT_SCAN_WORKERS, DEFAULT_WATCH_POLL_MS, PRIORITY_PREFETCH, PRIORITY_REFINE,
+    PRIORITY_VISIBLE,
+    DEFAULT_METADATA_WORKERS, DEFAULT_SIMILARITY_WORKERS, TRANSCODE_FORMATS, TRANSCODE_MAX_DIM, ZIP_COMPRESSION_MODES,
+    ExportCancelled, FolderWatcher, ImageCache, ImageCatalog, ImageLoader, LoadScheduler, MetadataIndex,
+    SelectionJournal, SimilarityIndex,
+    env_int, export_copy, export_transcoded, export_zip, fit_size, letterbox, load_app_state, load_selection,
+    parse_image_filter, save_app_state, save_selection, selection_items, perf, resident_memory_bytes,
+)
+# Pillow's Tk bindings and the contact sheet are imported on first use, so the window
+# appears without waiting for them
+
+# Set up logging (the log file is only created when the first record is written)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                    handlers=[logging.FileHandler('slide_chooser.log', encoding='utf-8', delay=True)])
 logger = logging.getLogger(__name__)
 
+# Interval for draining decoded images into Tk on the main thread
+RESULT_POLL_MS = 15
+
+# Intervals for applying scan batches, export progress and folder changes on the Tk thread
+SCAN_POLL_MS = 50
+EXPORT_POLL_MS = 100
+WATCH_APPLY_MS = 250
+INDEX_POLL_MS = 500
+
+# Refresh interval of the performance overlay
+PERF_OVERLAY_MS = 500
+
+# Quiet period after the last resize event before fast previews are refined to full quality
+RESIZE_SETTLE_MS = 150
+
+# Hover delay and longest generation text shown in slide tooltips
+TOOLTIP_DELAY_MS = 600
+TOOLTIP_TEXT_CHARS = 600
+
+# Slide canvas background, and the step in which reusable PhotoImage buffers are grown
+SLIDE_BACKGROUND = "#202020"
+BUFFER_STEP = 256
+
+# Sequence positions to prefetch in the direction of travel (override with
+# SLIDE_CHOOSER_PREFETCH); half as many are kept warm behind the view
+DEFAULT_PREFETCH_AHEAD = 3
+
+
+class Tooltip:
+    """Popup text shown while the pointer rests on a widget; text_fn() supplies it ("" for none)"""
+
+    def __init__(self, widget, text_fn, delay_ms=TOOLTIP_DELAY_MS):
+        self.widget = widget
+        self.text_fn = text_fn
+        self.delay_ms = delay_ms
+        self.window = None
+        self._pending = None
+        widget.bind("<Enter>", self.schedule, add="+")
+        widget.bind("<Leave>", self.hide, add="+")
+        widget.bind("<ButtonPress>", self.hide, add="+")
+
+    def schedule(self, event=None):
+        self.hide()
+        self._pending = self.widget.after(self.delay_ms, self.show)
+
+    def show(self):
+        self._pending = None
+        text = self.text_fn()
+        if not text:
+            return
+        self.window = tk.Toplevel(self.widget)
+        self.window.wm_overrideredirect(True)
+        self.window.wm_geometry(f"+{self.widget.winfo_pointerx() + 12}+{self.widget.winfo_pointery() + 16}")
+        tk.Label(self.window, text=text, justify=tk.LEFT, background="#ffffe0", relief=tk.SOLID,
+                 borderwidth=1, wraplength=480).pack()
+
+    def hide(self, event=None):
+        if self._pending is not None:
+            self.widget.after_cancel(self._pending)
+            self._pending = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+
+
 class SlideChooser(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -25,38 +104,82 @@ class SlideChooser(tk.Tk):
 
         # Application state
         self.master_folder = None
-        self.image_catalog = {}  # Structure: {image_name: {folder_path: full_image_path}}
+        self.image_catalog = ImageCatalog()
         self.current_sequence_index = 0
         self.slides_per_view = tk.IntVar(value=3)
+        self.zip_compression = tk.StringVar(value="auto")
+        self.export_mode = tk.StringVar(value="zip")  # "zip", an export_copy method or a TRANSCODE_FORMATS key
+        self.export_queue = queue.Queue()  # Progress events from the export thread
+        self.export_cancel = None  # threading.Event while an export is running
         self.selected_images = {}  # Structure: {image_name: selected_folder_path}
-        self.folders = []
+        self.journal = None  # SelectionJournal of the open master folder
+        self.folders = self.image_catalog.folders
         self.image_names = []
-        self.load_queue = queue.Queue()
-        self.image_cache = {}
-        
-        # Window resize tracking
-        self.last_width = self.winfo_width()
-        self.last_height = self.winfo_height()
-        self.size_threshold = 50  # Minimum pixel change to trigger resize
-        self.resize_timer = None  # Timer for resize events
-        self._resize_bound = False
+        self.scan_queue = queue.Queue()  # Catalog batches published by the scanner thread
+        self.scan_generation = 0  # Bumped when a new master folder is opened
+        self.scan_workers = env_int("SLIDE_CHOOSER_SCAN_WORKERS", DEFAULT_SCAN_WORKERS)
+        self.watcher = None  # FolderWatcher for the open master folder
+        self.watch_queue = queue.Queue()  # Debounced folder changes published by the watcher
+        self.watch_enabled = os.environ.get("SLIDE_CHOOSER_WATCH", "1") != "0"
+        self.watch_poll_ms = env_int("SLIDE_CHOOSER_WATCH_POLL_MS", DEFAULT_WATCH_POLL_MS)
+        self.loader = ImageLoader()  # Pyramid cache, thumbnail store and decode pool
+        self.result_queue = queue.Queue()  # Decoded images waiting to be handed to Tk
+        self.load_scheduler = LoadScheduler()
+        self.slot_callbacks = {}  # Structure: {slot: on_ready(photo)} for pending image requests
+        self.prefetch_ahead = env_int("SLIDE_CHOOSER_PREFETCH", DEFAULT_PREFETCH_AHEAD)
+        self.prefetch_generation = 0  # Bumped to cancel queued prefetch jobs
+        self.nav_direction = 1  # Direction of the last sequence move
+        self.keypress_id = 0  # Identifies the navigation whose keypress-to-pixels time is measured
+        self.perf_enabled = tk.BooleanVar(value=perf.enabled)
+        self.similarity = None  # SimilarityIndex of the open master folder
+        self.metadata = None  # MetadataIndex of the open master folder
+        self.index_queue = queue.Queue()  # Progress of the background metadata and similarity indexers
+        self.index_runs = (None, 0)  # (generation, indexer runs not yet finished), polled by one loop
+        self.metadata_workers = env_int("SLIDE_CHOOSER_METADATA_WORKERS", DEFAULT_METADATA_WORKERS)
+        self.sort_images = tk.StringVar(value="name")  # Sequence order: "name", "resolution" or "seed"
+        self.image_filter = None  # parse_image_filter() result limiting the sequence, or None
+        self.sort_keys = {}  # Structure: {order: {image_name: MetadataIndex.sort_key()}}, kept across merges
+        self.filter_matches = {}  # Structure: {image_name: whether it passes image_filter}
+        self.similarity_workers = env_int("SLIDE_CHOOSER_SIMILARITY_WORKERS", DEFAULT_SIMILARITY_WORKERS)
+        self.sort_versions = tk.BooleanVar(value=False)  # Step through versions best first
+        self.collapse_duplicates = tk.BooleanVar(value=False)  # Skip near-duplicate versions
+        self.contact_sheet = None  # ContactSheet window while it is open
+        self.reopen_last = os.environ.get("SLIDE_CHOOSER_REOPEN", "1") != "0"  # Reopen the last master folder
+        self.startup_ms = None  # (window shown, UI ready) in ms since STARTUP_STARTED, once started
+        self._result_poll = None
+        cache_budget_mb = env_int("SLIDE_CHOOSER_CACHE_MB", DEFAULT_CACHE_BUDGET_MB)
+        self.image_cache = ImageCache(cache_budget_mb * 2**20)  # PIL images at display size
+        self.resize_timer = None  # Pending full-quality refine after a live resize
+
+        # Create the status bar now and the rest of the UI once the window is on screen,
+        # so a cold start shows a window as early as possible
+        self.create_status_bar()
+        self.status_var.set("Starting...")
+        self.bind("<Map>", self.on_first_map)
+
+    def on_first_map(self, event):
+        """Finish building the UI once the empty window has been mapped and painted"""
+        if event.widget is self:
+            self.unbind("<Map>")
+            self.after_idle(self.finish_startup)
 
-        # Create UI
+    def finish_startup(self):
+        """Create the menus and slides, bind shortcuts and reopen the last master folder"""
+        shown_ms = (time.perf_counter() - STARTUP_STARTED) * 1000
         self.create_menu()
         self.create_main_frame()
-        self.create_status_bar()
         
         # Bind keyboard shortcuts
         self.bind("<Left>", lambda e: self.navigate_sequence(-1))
         self.bind("<Right>", lambda e: self.navigate_sequence(1))
-        
-        # Wait for window to be fully drawn before getting initial dimensions
-        self.after(100, self.initialize_dimensions)
+        self.status_var.set("Ready")
+        self.startup_ms = (shown_ms, (time.perf_counter() - STARTUP_STARTED) * 1000)
+        logger.info(f"Startup: window shown after {shown_ms:.0f} ms, UI ready after {self.startup_ms[1]:.0f} ms")
 
-    def initialize_dimensions(self):
-        """Get initial window dimensions after rendering"""
-        self.last_width = self.winfo_width()
-        self.last_height = self.winfo_height()
+        if self.reopen_last:
+            folder = load_app_state().get("last_master_folder")
+            if folder and os.path.isdir(folder):
+                self.open_master_folder(folder)
 
     def create_menu(self):
         menubar = tk.Menu(self)
@@ -65,7 +188,26 @@ class SlideChooser(tk.Tk):
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Open Master Folder", command=self.select_master_folder)
         file_menu.add_separator()
+        file_menu.add_command(label="Load Selection...", command=self.load_selection_file)
+        file_menu.add_command(label="Save Selection...", command=self.save_selection_file)
+        file_menu.add_command(label="Select Best Versions", command=self.select_best_versions)
+        file_menu.add_separator()
         file_menu.add_command(label="Export Selected", command=self.export_selected)
+        export_menu = tk.Menu(file_menu, tearoff=0)
+        export_labels = {"zip": "ZIP Archive", "copy": "Folder of Copies",
+                         "link": "Folder of Links (no extra disk space)",
+                         "webp": f"Folder of WebP Images (max {TRANSCODE_MAX_DIM} px)",
+                         "jpeg": f"Folder of JPEG Images (max {TRANSCODE_MAX_DIM} px)"}
+        for mode, label in export_labels.items():
+            export_menu.add_radiobutton(label=label, variable=self.export_mode, value=mode)
+        file_menu.add_cascade(label="Export As", menu=export_menu)
+        compression_menu = tk.Menu(file_menu, tearoff=0)
+        compression_labels = {"auto": "Auto (store PNG/JPEG/GIF, deflate others)", "stored": "Store All",
+                              "deflate": "Deflate All", "zstd": "Zstandard All"}
+        for mode in ZIP_COMPRESSION_MODES:
+            compression_menu.add_radiobutton(label=compression_labels[mode], variable=self.zip_compression,
+                                             value=mode)
+        file_menu.add_cascade(label="ZIP Compression", menu=compression_menu)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.quit)
         
@@ -77,6 +219,25 @@ class SlideChooser(tk.Tk):
                                   command=self.update_slides_per_view)
         view_menu.add_radiobutton(label="Show 3 Slides", variable=self.slides_per_view, value=3,
                                   command=self.update_slides_per_view)
+        view_menu.add_separator()
+        view_menu.add_command(label="Contact Sheet", command=self.show_contact_sheet)
+        view_menu.add_separator()
+        sort_menu = tk.Menu(view_menu, tearoff=0)
+        for order, label in (("name", "Name"), ("resolution", "Resolution (largest first)"), ("seed", "Seed")):
+            sort_menu.add_radiobutton(label=label, variable=self.sort_images, value=order,
+                                      command=self.reorder_images)
+        view_menu.add_cascade(label="Sort Images By", menu=sort_menu)
+        view_menu.add_command(label="Filter Images...", command=self.ask_image_filter)
+        view_menu.add_command(label="Show All Images", command=self.clear_image_filter)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Sort Versions by Quality", variable=self.sort_versions,
+                                  command=self.update_sequence_display)
+        view_menu.add_checkbutton(label="Collapse Near-Duplicates", variable=self.collapse_duplicates,
+                                  command=self.update_sequence_display)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Performance Overlay", variable=self.perf_enabled,
+                                  command=self.toggle_perf_overlay)
+        view_menu.add_command(label="Export Performance Trace...", command=self.export_perf_trace)
         
         # Help menu
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -139,9 +300,13 @@ class SlideChooser(tk.Tk):
         img_frame.columnconfigure(0, weight=1)
         img_frame.rowconfigure(0, weight=1)
         
-        # Image label
-        img_label = ttk.Label(img_frame)
-        img_label.grid(row=0, column=0, sticky="nsew")
+        # Image canvas: one reusable PhotoImage buffer, anchored top-left and clipped to the canvas
+        img_canvas = tk.Canvas(img_frame, width=1, height=1, highlightthickness=0, background=SLIDE_BACKGROUND)
+        img_canvas.grid(row=0, column=0, sticky="nsew")
+        canvas_image = img_canvas.create_image(0, 0, anchor=tk.NW, state=tk.HIDDEN)
+        canvas_text = img_canvas.create_text(0, 0, text="No image", fill="white")
+        img_canvas.bind("<Configure>", lambda e, f=frame: self.on_slide_resize(f))
+        Tooltip(img_canvas, lambda f=frame: self.slide_tooltip(f))
         
         # Version info
         version_frame = ttk.Frame(frame)
@@ -158,7 +323,12 @@ class SlideChooser(tk.Tk):
         down_button.configure(command=lambda idx=index: self.navigate_version(idx, 1))
         
         # Store references to widgets
-        frame.img_label = img_label
+        frame.img_canvas = img_canvas
+        frame.canvas_image = canvas_image
+        frame.canvas_text = canvas_text
+        frame.buffer = None  # ImageTk.PhotoImage reused for every image shown in this slide
+        frame.source = None  # PIL image currently shown, kept for resize previews
+        frame.preview_pending = None
         frame.version_var = version_var
         frame.up_button = up_button
         frame.down_button = down_button
@@ -177,76 +347,499 @@ class SlideChooser(tk.Tk):
         status_label = ttk.Label(self.status_bar, textvariable=self.status_var, anchor=tk.W)
         status_label.pack(side=tk.LEFT, fill=tk.X, padx=5, pady=2)
         
-        # Progress bar
+        # Progress bar (with a cancel button shown while an export is running)
+        self.cancel_button = ttk.Button(self.status_bar, text="Cancel", command=self.cancel_export)
         self.progress = ttk.Progressbar(self.status_bar, mode='determinate')
         self.progress.pack(side=tk.RIGHT, padx=5, pady=2)
+        
+        # Image cache statistics
+        self.cache_var = tk.StringVar(value=self.image_cache.stats_text())
+        cache_label = ttk.Label(self.status_bar, textvariable=self.cache_var, anchor=tk.E)
+        cache_label.pack(side=tk.RIGHT, padx=5, pady=2)
+        
+        # Performance overlay (only packed while instrumentation is enabled)
+        self.perf_var = tk.StringVar()
+        self.perf_label = ttk.Label(self.status_bar, textvariable=self.perf_var, anchor=tk.E)
+        if perf.enabled:
+            self.toggle_perf_overlay()
+    
+    def toggle_perf_overlay(self):
+        """Enable or disable instrumentation and its status bar panel"""
+        perf.enabled = self.perf_enabled.get()
+        if perf.enabled:
+            self.perf_label.pack(side=tk.RIGHT, padx=5, pady=2)
+            self.update_perf_overlay()
+        else:
+            self.perf_label.pack_forget()
+    
+    def update_perf_overlay(self):
+        """Refresh the performance panel while instrumentation is enabled"""
+        if not perf.enabled:
+            return
+        parts = []
+        decode = perf.stats("decode")
+        if decode:
+            parts.append(f"Decode {decode[1] * 1000:.0f} ms avg / {decode[2] * 1000:.0f} max")
+        parts.append(f"Queue {perf.counter_value('decode_queue', 0)}")
+        latency = perf.stats("keypress_to_pixels")
+        if latency:
+            parts.append(f"Key\u2192pixels {latency[3] * 1000:.0f} ms (avg {latency[1] * 1000:.0f})")
+        lookups = self.image_cache.hits + self.image_cache.misses
+        if lookups:
+            parts.append(f"Hits {100 * self.image_cache.hits / lookups:.0f}%")
+        rss = resident_memory_bytes()
+        if rss is not None:
+            parts.append(f"RSS {rss / 2**20:.0f} MB")
+        self.perf_var.set(" | ".join(parts))
+        self.after(PERF_OVERLAY_MS, self.update_perf_overlay)
+    
+    def export_perf_trace(self):
+        """Save recorded instrumentation as a Chrome trace-event JSON file"""
+        path = filedialog.asksaveasfilename(
+            title="Export Performance Trace",
+            defaultextension=".json",
+            filetypes=[("Trace files", "*.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            count = perf.export_chrome_trace(path)
+        except OSError as e:
+            logger.error(f"Error exporting performance trace: {str(e)}")
+            messagebox.showerror("Export Performance Trace", f"Failed to export trace: {str(e)}")
+            return
+        self.status_var.set(f"Exported {count} trace events to {path}")
+        if not perf.enabled:
+            messagebox.showinfo("Export Performance Trace",
+                                "Instrumentation is off; enable View > Performance Overlay to record events.")
+    
+    def update_cache_status(self):
+        """Refresh the cache statistics shown in the status bar"""
+        self.cache_var.set(self.image_cache.stats_text())
 
     def select_master_folder(self):
         folder = filedialog.askdirectory(title="Select Master Folder")
         if folder:
-            self.master_folder = folder
-            self.folder_var.set(folder)
-            
-            # Start scanning in a separate thread to keep UI responsive
-            threading.Thread(target=self.scan_master_folder, daemon=True).start()
+            self.open_master_folder(folder)
+            save_app_state({**load_app_state(), "last_master_folder": folder})
+
+    def open_master_folder(self, folder):
+        """Show a master folder: scan its batches and restore its journaled selections"""
+        self.master_folder = folder
+        self.folder_var.set(folder)
+        
+        # Reset the catalog; it is filled in progressively as subfolders are scanned
+        self.stop_watcher()
+        self.metadata = None
+        self.similarity = None
+        self.forget_image_keys()
+        self.open_journal(folder)
+        self.scan_generation += 1
+        self.image_catalog = ImageCatalog(folder)
+        self.folders = self.image_catalog.folders
+        self.image_names = []
+        self.current_sequence_index = 0
+        for frame in self.slide_frames:
+            self.clear_slide_frame(frame)
+        self.update_sequence_display()
+        if self.contact_sheet is not None:
+            self.contact_sheet.refresh()
+        self.status_var.set("Scanning master folder..." if not self.selected_images else
+                            f"Scanning master folder... (restored {len(self.selected_images)} selections)")
+        self.progress["value"] = 0
+        
+        # Start scanning in a separate thread to keep UI responsive
+        threading.Thread(target=self.scan_master_folder,
+                         args=(folder, self.scan_generation), daemon=True).start()
+        self.after(SCAN_POLL_MS, self.process_scan_results, self.scan_generation)
     
-    def scan_master_folder(self):
-        """Scan the master folder for images and build the catalog"""
+    def scan_master_folder(self, master_folder, generation):
+        """
+        Scan the master folder, reusing the persisted listing of unchanged subfolders and
+        listing the rest concurrently. Each folder's images are published to scan_queue as
+        soon as they are known (runs off the Tk thread, must not touch Tk)
+        """
         try:
-            self.status_var.set("Scanning master folder...")
-            self.image_catalog = defaultdict(dict)
-            self.folders = []
-            
-            # Get all immediate subfolders
-            self.folders = [f for f in os.listdir(self.master_folder) 
-                           if os.path.isdir(os.path.join(self.master_folder, f))]
-                           
-            if not self.folders:
-                raise ValueError("No subfolders found in master folder")
-                
-            # Initialize progress bar
-            total_folders = len(self.folders)
-            self.progress["maximum"] = total_folders
-            self.progress["value"] = 0
-            
-            # Scan each subfolder
-            for folder_idx, folder in enumerate(self.folders):
-                folder_path = os.path.join(self.master_folder, folder)
-                
-                # Get all images in the folder
-                image_files = [f for f in os.listdir(folder_path) 
-                              if os.path.isfile(os.path.join(folder_path, f)) and 
-                              f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
-                
-                # Add to catalog
-                for img in image_files:
-                    self.image_catalog[img][folder] = os.path.join(folder_path, img)
-                
-                # Update progress
-                self.progress["value"] = folder_idx + 1
-                self.update_idletasks()
-            
-            # Get sorted list of image names
-            self.image_names = sorted(list(self.image_catalog.keys()))
-            
-            # Log catalog info
-            logger.info(f"Scanned master folder: {self.master_folder}")
-            logger.info(f"Found {len(self.folders)} subfolders and {len(self.image_names)} unique images")
-            
-            # Update UI
-            self.after(0, self.update_ui_after_scan)
+            for kind, payload in slide_core.scan_master_folder(
+                    master_folder, self.scan_workers, is_cancelled=lambda: generation != self.scan_generation):
+                self.scan_queue.put((generation, kind, payload))
+            self.scan_queue.put((generation, "done", None))
         
         except Exception as e:
             logger.error(f"Error scanning master folder: {str(e)}")
-            messagebox.showerror("Error", f"Failed to scan master folder: {str(e)}")
-            self.status_var.set("Error scanning folder")
+            self.scan_queue.put((generation, "error", str(e)))
+    
+    def process_scan_results(self, generation):
+        """Merge scanned catalog batches into the UI state (runs on the Tk thread)"""
+        if generation != self.scan_generation:
+            return  # A newer master folder was opened; its own loop takes over
+        finished = False
+        changed_names = set()
+        while True:
+            try:
+                event_generation, kind, payload = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event_generation != generation:
+                continue  # Left over from a previous master folder
+            
+            if kind == "folders":
+                for folder in payload:
+                    self.image_catalog.add_folder(folder)
+                self.progress["maximum"] = len(payload)
+                self.progress["value"] = 0
+            elif kind == "batch":
+                folder, names = payload
+                self.image_catalog.add(folder, names)
+                changed_names.update(names)
+                self.progress["value"] += 1
+            elif kind == "error":
+                messagebox.showerror("Error", f"Failed to scan master folder: {payload}")
+                self.status_var.set("Error scanning folder")
+                return
+            else:
+                finished = True
+        
+        if changed_names:
+            self.merge_scanned_names(changed_names)
+        if finished:
+            self.update_ui_after_scan()
+            self.start_watcher()
+            self.metadata = MetadataIndex(self.master_folder)
+            self.similarity = SimilarityIndex(self.master_folder)
+            self.start_image_index()
+        else:
+            self.status_var.set(f"Scanning master folder... {int(self.progress['value'])}/{len(self.folders)} "
+                                f"folders, {len(self.image_names)} images so far")
+            self.after(SCAN_POLL_MS, self.process_scan_results, generation)
+    
+    def merge_scanned_names(self, changed_names):
+        """Re-sort image names after a scan batch or a change of order, keeping the current view anchored"""
+        num_slides = self.slides_per_view.get()
+        visible = self.image_names[self.current_sequence_index:self.current_sequence_index + num_slides]
+        anchor = visible[0] if visible else None
+        
+        # Get sorted (and filtered) list of image names
+        self.forget_image_keys(changed_names)
+        self.image_names = self.ordered_names()
+        if anchor is not None:
+            if self.image_order() == "name":
+                # The anchor's position, or where it was if the folder watcher removed it
+                position = bisect.bisect_left(self.image_names, anchor)
+            else:
+                try:
+                    position = self.image_names.index(anchor)
+                except ValueError:
+                    position = self.current_sequence_index
+            self.current_sequence_index = min(position, max(0, len(self.image_names) - 1))
+        
+        # Only redraw if the visible images (or their available versions) changed
+        new_visible = self.image_names[self.current_sequence_index:self.current_sequence_index + num_slides]
+        if new_visible != visible or changed_names.intersection(new_visible):
+            self.update_sequence_display()
+        if self.contact_sheet is not None:
+            self.contact_sheet.refresh()
+    
+    def open_journal(self, folder):
+        """Switch the selection to the one journaled for a master folder in earlier sessions"""
+        self.close_journal()
+        self.journal = SelectionJournal(folder)
+        self.selected_images = self.journal.load()
+        if self.selected_images:
+            logger.info(f"Restored {len(self.selected_images)} selections for {folder}")
+    
+    def close_journal(self):
+        """Flush and compact the selection journal of the open master folder"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+    
+    def journal_selection(self, names):
+        """Journal the current selection state of some images (None for deselected ones)"""
+        if self.journal is not None:
+            self.journal.record({name: self.selected_images.get(name) for name in names})
+    
+    def shutdown(self):
+        """Stop background work and make sure every selection change is on disk"""
+        self.stop_watcher()
+        self.close_journal()
+        self.loader.shutdown()
+    
+    def start_watcher(self):
+        """Watch the open master folder so new batches show up without a rescan"""
+        self.stop_watcher()
+        if not self.watch_enabled:
+            return
+        generation = self.scan_generation
+        self.watcher = FolderWatcher(
+            self.master_folder, self.folders,
+            lambda listings, modified: self.watch_queue.put((generation, listings, modified)),
+            self.watch_poll_ms)
+        self.watcher.start()
+        logger.info(f"Watching {self.master_folder} for changes ({self.watcher.mode})")
+        self.after(WATCH_APPLY_MS, self.process_watch_events, generation)
+    
+    def stop_watcher(self):
+        """Stop watching the master folder"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+    
+    def process_watch_events(self, generation):
+        """Apply folder changes published by the watcher (runs on the Tk thread)"""
+        if generation != self.scan_generation or self.watcher is None:
+            return
+        while True:
+            try:
+                event_generation, listings, modified = self.watch_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event_generation == generation:
+                self.apply_folder_changes(listings, modified)
+        self.after(WATCH_APPLY_MS, self.process_watch_events, generation)
+    
+    def apply_folder_changes(self, listings, modified):
+        """
+        Merge fresh listings of changed subfolders into the catalog, dropping cached images
+        of files that were removed or rewritten, while keeping the current position, the
+        versions on screen and every selection that still exists
+        """
+        catalog = self.image_catalog
+        num_slides = self.slides_per_view.get()
+        # Folder indices shift when folders come and go, so remember shown versions by name
+        shown = {frame: self.folders[frame.current_folder_index]
+                 for frame in self.slide_frames[:num_slides] if frame.image_name}
+        
+        changed_names = {name for _, name in modified}
+        stale_paths = {os.path.join(self.master_folder, folder, name) for folder, name in modified}
+        stale_folders = []
+        added = removed = 0
+        for folder, names in listings.items():
+            folder_index = catalog.folder_index(folder)
+            old = set(catalog.folder_names(folder_index)) if folder_index is not None else set()
+            if names is None:
+                catalog.remove_folder(folder)
+                stale_folders.append(os.path.join(self.master_folder, folder) + os.sep)
+                gone = old
+            else:
+                new = set(names)
+                catalog.insert_folder(folder)
+                catalog.add(folder, new - old)
+                gone = old - new
+                catalog.discard(catalog.folder_index(folder), gone)
+                stale_paths.update(os.path.join(self.master_folder, folder, name) for name in gone)
+                changed_names |= new - old
+                added += len(new - old)
+            changed_names |= gone
+            removed += len(gone)
+        
+        # Invalidate only the cache entries of removed or rewritten files
+        if stale_paths or stale_folders:
+            stale_prefixes = tuple(stale_folders)
+            
+            def is_stale(key):
+                path = key if isinstance(key, str) else key[0]
+                return path in stale_paths or path.startswith(stale_prefixes)
+            self.image_cache.discard_if(is_stale)
+            self.loader.pyramid_cache.discard_if(is_stale)
+        
+        # Drop selections of versions that no longer exist
+        dropped = []
+        for name in changed_names.intersection(self.selected_images):
+            if catalog.path(name, catalog.folder_index(self.selected_images[name])) is None:
+                logger.info(f"Selected version of {name} was removed from {self.selected_images[name]}")
+                del self.selected_images[name]
+                dropped.append(name)
+        self.journal_selection(dropped)
+        for frame, folder in shown.items():
+            folder_index = catalog.folder_index(folder)
+            if folder_index is None:
+                changed_names.add(frame.image_name)
+                folder_index = self.default_folder_index(frame.image_name)
+            frame.current_folder_index = folder_index
+        
+        self.merge_scanned_names(changed_names)
+        self.status_var.set(f"Folder update: {added} images added, {removed} removed "
+                            f"({len(self.folders)} folders, {len(self.image_names)} images)")
+        self.update_cache_status()
+        self.start_image_index(changed_names.intersection(catalog.names()))
+    
+    def start_image_index(self, names=None):
+        """
+        Read the headers of new and changed images (all of them, or those of names) in the
+        background, for layout, sorting and filtering, then analyse them for ranking
+        versions by quality and grouping near-duplicates
+        """
+        if self.similarity is None or names is not None and not names:
+            return
+        generation = self.scan_generation
+        metadata = self.metadata
+        similarity = self.similarity
+        catalog = self.image_catalog.copy()  # The watcher may change the live catalog meanwhile
+        
+        def is_cancelled():
+            return generation != self.scan_generation
+        
+        def run():
+            try:
+                if names is None:
+                    metadata.load()
+                    similarity.load()
+                metadata.update(
+                    catalog, names, self.metadata_workers,
+                    progress=lambda done, total: self.index_queue.put((generation, "metadata_progress", (done, total))),
+                    is_cancelled=is_cancelled)
+                # Sort keys walk every version of every name, which would stall the Tk thread
+                self.index_queue.put((generation, "metadata_done", (names, metadata.sort_keys(catalog, names))))
+                computed = similarity.update(
+                    catalog, names, self.similarity_workers,
+                    progress=lambda done, total: self.index_queue.put((generation, "progress", (done, total))),
+                    is_cancelled=is_cancelled)
+                self.index_queue.put((generation, "done", computed))
+            except Exception as e:
+                logger.error(f"Error building image indexes: {str(e)}")
+                self.index_queue.put((generation, "error", str(e)))
+        
+        threading.Thread(target=run, daemon=True).start()
+        # Watcher updates start further runs; the poll loop already running covers them too
+        runs = self.index_runs[1] if self.index_runs[0] == generation else 0
+        self.index_runs = (generation, runs + 1)
+        if not runs:
+            self.after(INDEX_POLL_MS, self.process_index_events, generation)
+    
+    def process_index_events(self, generation):
+        """Show indexing progress and refresh order and layout as indexes finish (runs on the Tk thread)"""
+        if generation != self.scan_generation:
+            return
+        progress = None
+        finished = False
+        while True:
+            try:
+                event_generation, kind, payload = self.index_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event_generation != generation:
+                continue
+            if kind == "metadata_progress":
+                progress = ("Reading image headers", payload)
+            elif kind == "progress":
+                progress = ("Analysing images for similarity", payload)
+            elif kind == "metadata_done":
+                names, sort_keys = payload
+                self.forget_image_keys(names)
+                for order, keys in sort_keys.items():
+                    self.sort_keys.setdefault(order, {}).update(keys)
+                if self.image_order() != "name" or self.image_filter is not None:
+                    self.merge_scanned_names(set())
+            else:
+                finished = True
+                self.index_runs = (generation, self.index_runs[1] - 1)
+                if kind == "done" and payload:
+                    self.status_var.set(f"Similarity index ready: analysed {payload} images")
+        
+        if finished and (self.sort_versions.get() or self.collapse_duplicates.get()):
+            self.update_sequence_display()
+        if not self.index_runs[1]:
+            return
+        if progress is not None and progress[1][0] < progress[1][1]:
+            self.status_var.set(f"{progress[0]}... {progress[1][0]}/{progress[1][1]}")
+        self.after(INDEX_POLL_MS, self.process_index_events, generation)
+    
+    def image_order(self):
+        """Order of the image sequence; by name until image headers have been read"""
+        return self.sort_images.get() if self.metadata is not None and len(self.metadata) else "name"
+    
+    def ordered_names(self):
+        """
+        Image names in the chosen order (View > Sort Images By), limited by the image filter.
+        Sort keys and filter results are cached per name, so only names that changed since
+        the last call are looked up in the metadata index.
+        """
+        names = self.image_catalog.names()
+        if self.image_filter is not None and self.metadata is not None and len(self.metadata):
+            matches = self.filter_matches
+            for name in names - matches.keys():
+                matches[name] = self.metadata.matches(self.image_catalog, name, self.image_filter)
+            names = [name for name in names if matches[name]]
+        order = self.image_order()
+        if order == "name":
+            return sorted(names)
+        keys = self.sort_keys.setdefault(order, {})
+        for name in set(names) - keys.keys():
+            keys[name] = self.metadata.sort_key(self.image_catalog, name, order)
+        return sorted(names, key=keys.__getitem__)
+    
+    def forget_image_keys(self, names=None):
+        """Drop the cached sort keys and filter results of names (or of every image) after they changed"""
+        if names is None:
+            self.sort_keys = {}
+            self.filter_matches = {}
+            return
+        for keys in (*self.sort_keys.values(), self.filter_matches):
+            for name in names:
+                keys.pop(name, None)
+    
+    def reorder_images(self):
+        """Apply a new sequence order or filter, keeping the current image in view"""
+        if self.image_order() != self.sort_images.get():
+            self.status_var.set("Image headers have not been read yet; images stay sorted by name for now")
+        self.merge_scanned_names(set())
+    
+    def ask_image_filter(self):
+        """Limit the sequence to images with a version of at least a given size and/or with a given seed"""
+        current = ""
+        if self.image_filter is not None:
+            min_size, seed = self.image_filter["min_size"], self.image_filter["seed"]
+            current = " ".join(filter(None, (f"{min_size[0]}x{min_size[1]}" if min_size else "",
+                                             f"seed {seed}" if seed is not None else "")))
+        text = simpledialog.askstring("Filter Images",
+                                      "Show images with a version of at least WIDTHxHEIGHT and/or with a seed,\n"
+                                      "e.g. 1024x1024, seed 1234 or 2048x0 seed 1234:",
+                                      initialvalue=current, parent=self)
+        if text is None:
+            return
+        if not text.strip():
+            self.clear_image_filter()
+            return
+        try:
+            self.image_filter = parse_image_filter(text)
+        except ValueError as e:
+            messagebox.showerror("Filter Images", str(e))
+            return
+        self.filter_matches = {}
+        self.reorder_images()
+        self.status_var.set(f"Showing {len(self.image_names)} of {len(self.image_catalog)} images")
+    
+    def clear_image_filter(self):
+        """Show every image again"""
+        if self.image_filter is not None:
+            self.image_filter = None
+            self.filter_matches = {}
+            self.reorder_images()
+            self.status_var.set(f"Showing all {len(self.image_names)} images")
+    
+    def select_best_versions(self):
+        """Pre-fill the selection with the highest scoring version of every unselected image"""
+        if self.similarity is None or not len(self.similarity):
+            messagebox.showinfo("Select Best Versions", "The similarity index is not ready yet")
+            return
+        chosen = {}
+        for name in self.image_names:
+            if name not in self.selected_images:
+                folder_index = self.similarity.best_version(self.image_catalog, name)
+                if folder_index is not None:
+                    chosen[name] = self.folders[folder_index]
+        self.selected_images.update(chosen)
+        self.journal_selection(chosen)
+        self.update_sequence_display()
+        if self.contact_sheet is not None:
+            self.contact_sheet.refresh()
+        self.status_var.set(f"Selected the best version of {len(chosen)} images")
     
     def update_ui_after_scan(self):
         """Update the UI after folder scanning is complete"""
         if self.image_names:
             self.status_var.set(f"Found {len(self.folders)} folders with {len(self.image_names)} images")
-            self.current_sequence_index = 0
-            self.update_sequence_display()
         else:
             self.status_var.set("No images found in master folder")
     
@@ -261,18 +854,9 @@ class SlideChooser(tk.Tk):
             else:
                 frame.pack_forget()
         
-        # Refresh the display
+        # Lay out the slide canvases at their new size before rendering into them
+        self.update_idletasks()
         self.update_sequence_display()
-        
-        # Bind to configure event for dynamic resizing if not already bound
-        if not hasattr(self, '_resize_bound') or not self._resize_bound:
-            self.bind("<Configure>", self.on_window_resize)
-            self._resize_bound = True
-        
-        # Reset window dimension tracking to force refresh
-        self.last_width = 0
-        self.last_height = 0
-        self.check_and_update_size()
     
     def navigate_sequence(self, direction):
         """Navigate to the next/previous sequence of images"""
@@ -284,8 +868,16 @@ class SlideChooser(tk.Tk):
         
         new_index = self.current_sequence_index + direction
         if 0 <= new_index <= max_index:
+            # Time from this keypress until every visible slide shows its image
+            perf.discard("keypress_to_pixels", self.keypress_id)
+            self.keypress_id += 1
+            perf.begin("keypress_to_pixels", self.keypress_id)
+            
+            self.nav_direction = 1 if direction > 0 else -1
             self.current_sequence_index = new_index
-            self.update_sequence_display()
+            with perf.span("navigate_sequence", index=new_index):
+                self.update_sequence_display()
+            self.check_view_complete()
     
     def navigate_version(self, slide_index, direction):
         """Navigate to the next/previous version (folder) of the image"""
@@ -296,8 +888,10 @@ class SlideChooser(tk.Tk):
         if not frame.image_name:
             return
             
-        # Calculate the new folder index
-        new_folder_index = (frame.current_folder_index + direction) % len(self.folders)
+        # Calculate the new folder index, skipping folders that lack this image
+        new_folder_index = self.adjacent_version(frame.image_name, frame.current_folder_index, direction)
+        if new_folder_index is None:
+            return
         frame.current_folder_index = new_folder_index
         
         # Update the image display
@@ -305,11 +899,44 @@ class SlideChooser(tk.Tk):
         
         # Update selected images dict
         self.selected_images[frame.image_name] = self.folders[new_folder_index]
+        self.journal_selection([frame.image_name])
+        if self.contact_sheet is not None:
+            self.contact_sheet.update_row_selection(self.current_sequence_index + slide_index)
+        self.schedule_prefetch()
+    
+    def show_contact_sheet(self):
+        """Open the contact sheet window, or raise it if it is already open"""
+        if self.contact_sheet is None:
+            from contact_sheet import ContactSheet
+            self.contact_sheet = ContactSheet(self)
+        else:
+            self.contact_sheet.deiconify()
+            self.contact_sheet.lift()
+    
+    def select_version(self, image_name, folder_index):
+        """Select a version of an image (from the contact sheet) and show it if it is on screen"""
+        self.selected_images[image_name] = self.folders[folder_index]
+        self.journal_selection([image_name])
+        num_slides = self.slides_per_view.get()
+        for frame in self.slide_frames[:num_slides]:
+            if frame.image_name == image_name:
+                self.display_image_in_frame(image_name, frame, folder_index)
+        self.schedule_prefetch()
+    
+    def jump_to_image(self, image_index):
+        """Move the main view so that it starts at the given image"""
+        num_slides = self.slides_per_view.get()
+        max_index = max(0, len(self.image_names) - num_slides)
+        self.current_sequence_index = min(image_index, max_index)
+        self.update_sequence_display()
+        self.lift()
     
     def update_sequence_display(self, resize_only=False):
         """Update the sequence navigation and slide display"""
         if not self.image_names:
             self.sequence_label.config(text="Sequence: 0 / 0")
+            for frame in self.slide_frames:
+                self.clear_slide_frame(frame)
             return
             
         num_slides = self.slides_per_view.get()
@@ -326,68 +953,152 @@ class SlideChooser(tk.Tk):
                 img_idx = self.current_sequence_index + i
                 if img_idx < len(self.image_names):
                     img_name = self.image_names[img_idx]
-                    # Force reload when resizing
-                    self.display_image_in_frame(img_name, self.slide_frames[i], force_reload=resize_only)
+                    self.display_image_in_frame(img_name, self.slide_frames[i])
                 else:
                     self.clear_slide_frame(self.slide_frames[i])
+        self.schedule_prefetch()
     
-    def on_window_resize(self, event=None):
+    def schedule_prefetch(self):
         """
-        Handle window resize events with improved timer-based approach and 
-        threshold detection to minimize unnecessary reloads
+        Warm the cache for the sequence positions around the view (more of them in the
+        direction of travel) and for the neighbouring versions of each visible slide
         """
-        # Skip if event is None
-        if event is None:
+        self.prefetch_generation += 1
+        if not self.image_names or not self.folders:
             return
-            
-        # Skip if not related to our main window
-        try:
-            if event.widget != self:
-                return
-        except (AttributeError, TypeError):
-            return  # Skip if event has no widget attribute
-        
-        # Cancel existing timer if one exists
-        if self.resize_timer is not None:
-            try:
-                self.after_cancel(self.resize_timer)
-            except Exception:
-                pass
-            self.resize_timer = None
-        
-        # Schedule a new timer
-        self.resize_timer = self.after(200, self.check_and_update_size)
-
-    def check_and_update_size(self):
-        """Check if window size has changed significantly and update if needed"""
-        # Clear the timer reference
-        self.resize_timer = None
         
-        # Only proceed if we have images
-        if not self.image_names or not hasattr(self, 'current_sequence_index'):
-            return
+        box = self.get_optimal_image_size()
+        num_slides = self.slides_per_view.get()
+        start = self.current_sequence_index
         
-        # Get current dimensions
-        current_width = self.winfo_width()
-        current_height = self.winfo_height()
+        # (distance, image name, folder index) candidates, nearest first
+        candidates = []
+        for i, frame in enumerate(self.slide_frames[:num_slides]):
+            if frame.image_name and len(self.folders) > 1:
+                for step in (1, -1):
+                    folder_index = self.adjacent_version(frame.image_name, frame.current_folder_index, step)
+                    if folder_index is not None:
+                        candidates.append((1, frame.image_name, folder_index))
+        behind = max(1, self.prefetch_ahead // 2)
+        ahead_range = range(start + num_slides, start + num_slides + self.prefetch_ahead)
+        behind_range = range(start - 1, start - 1 - behind, -1)
+        if self.nav_direction < 0:
+            ahead_range = range(start - 1, start - 1 - self.prefetch_ahead, -1)
+            behind_range = range(start + num_slides, start + num_slides + behind)
+        for distance, img_idx in itertools.chain(enumerate(ahead_range, 1), enumerate(behind_range, 2)):
+            if 0 <= img_idx < len(self.image_names):
+                name = self.image_names[img_idx]
+                candidates.append((distance, name, self.default_folder_index(name)))
+        candidates.sort(key=lambda c: c[0])
         
-        # Check if size changed enough to warrant reloading
-        width_delta = abs(current_width - self.last_width)
-        height_delta = abs(current_height - self.last_height)
+        # Stay well within both memory budgets so prefetching never evicts the view
+        limit = self.image_cache.budget_bytes // 2 // max(1, box[0] * box[1] * 4)
+        if len(self.loader.pyramid_cache):
+            average_pyramid = self.loader.pyramid_cache.total_bytes // len(self.loader.pyramid_cache)
+            limit = min(limit, self.loader.pyramid_cache.budget_bytes // 2 // max(1, average_pyramid))
         
-        if width_delta > self.size_threshold or height_delta > self.size_threshold:
-            # Update stored dimensions
-            self.last_width = current_width
-            self.last_height = current_height
-            
-            # Update the display with resize flag
-            self.update_sequence_display(resize_only=True)
-            
-            # Log size change
-            logger.debug(f"Window resized to {current_width}x{current_height}, reloading images")
+        generation = self.prefetch_generation
+        for distance, name, folder_index in candidates[:limit]:
+            img_path = self.image_catalog.path(name, folder_index)
+            img_size = self.display_size(name, folder_index, box)
+            if img_path and (img_path, img_size[0], img_size[1]) not in self.image_cache:
+                self.loader.decode_pool.submit(self.prefetch_job, img_path, img_size, generation, box,
+                                               priority=PRIORITY_PREFETCH + distance)
+        self.schedule_result_poll()
+    
+    def prefetch_job(self, img_path, img_size, generation, size_tag):
+        """Decode an off-screen image into the caches on a pool thread (must not touch Tk)"""
+        cache_key = (img_path, img_size[0], img_size[1])
+        # Skip prefetches superseded by further navigation or already loaded
+        if generation != self.prefetch_generation or cache_key in self.image_cache:
+            return
+        try:
+            # Prefetched images are shown as they are, so they come from the original, not a stored preview
+            img = self.loader.render(img_path, img_size, preview=False)
+            self.result_queue.put((cache_key, img, size_tag, False))
+        except Exception as e:
+            logger.debug(f"Prefetch of {img_path} failed: {str(e)}")
+    
+    def default_folder_index(self, image_name):
+        """
+        Folder index shown for an image: its selected version, otherwise the best version
+        when versions are sorted by quality, otherwise the first folder with it
+        """
+        folder_index = self.image_catalog.folder_index(self.selected_images.get(image_name))
+        if folder_index is None and self.similarity is not None and self.sort_versions.get():
+            folder_index = self.similarity.best_version(self.image_catalog, image_name)
+        if folder_index is None:
+            folder_index = self.image_catalog.first_folder(image_name)
+        return folder_index if folder_index is not None else 0
+    
+    def adjacent_version(self, image_name, folder_index, direction):
+        """
+        Next/previous version of an image (wrapping around): in folder order, or best first
+        when versions are sorted by quality or near-duplicates are collapsed
+        """
+        if self.similarity is None or not (self.sort_versions.get() or self.collapse_duplicates.get()):
+            return self.image_catalog.next_folder(image_name, folder_index, direction)
+        order = self.similarity.ranked_versions(self.image_catalog, image_name, self.collapse_duplicates.get())
+        if not order:
+            return None
+        if folder_index not in order:
+            # The current version was collapsed into a better duplicate
+            return order[0] if direction > 0 else order[-1]
+        return order[(order.index(folder_index) + direction) % len(order)]
+    
+    def version_text(self, image_name, folder_index):
+        """Folder name of a version, with its quality score once it has been analysed"""
+        folder_name = self.folders[folder_index]
+        score = self.similarity.score(folder_name, image_name) if self.similarity is not None else None
+        return folder_name if score is None else f"{folder_name}  (quality {score:.1f})"
+    
+    def on_slide_resize(self, frame):
+        """
+        Keep a slide responsive while its canvas is being resized: repaint a fast preview
+        once per idle cycle, and refine to full quality when resize events stop arriving
+        """
+        width, height = frame.img_canvas.winfo_width(), frame.img_canvas.winfo_height()
+        frame.img_canvas.coords(frame.canvas_text, width // 2, height // 2)
+        if frame.source is None:
+            return
+        if frame.preview_pending is None:
+            frame.preview_pending = self.after_idle(self.paint_preview, frame)
+        if self.resize_timer is not None:
+            self.after_cancel(self.resize_timer)
+        self.resize_timer = self.after(RESIZE_SETTLE_MS, self.refine_after_resize)
+    
+    def paint_preview(self, frame):
+        """Paint a nearest-neighbour preview of a slide's image at the canvas's current size"""
+        frame.preview_pending = None
+        if frame.source is None or not frame.image_name:
+            return
+        box = self.slide_box(frame)
+        img_path = self.image_catalog.path(frame.image_name, frame.current_folder_index)
+        img = self.loader.preview(img_path, box) if img_path else None
+        if img is None:
+            # Pyramid evicted: stretch the image that is on screen instead
+            from PIL import Image, ImageOps
+            img = ImageOps.contain(frame.source, box, Image.Resampling.NEAREST)
+        self.paint_frame(frame, img)
+    
+    def refine_after_resize(self):
+        """Replace resize previews with full-quality images for the new size"""
+        self.resize_timer = None
+        if self.image_names:
+            with perf.span("refine_after_resize"):
+                self.update_sequence_display(resize_only=True)
+    
+    def slide_box(self, frame):
+        """Drawable size of a slide's canvas"""
+        return (max(1, frame.img_canvas.winfo_width()), max(1, frame.img_canvas.winfo_height()))
     
     def get_optimal_image_size(self):
-        """Calculate the optimal image size based on current window dimensions"""
+        """Calculate the box available to each slide based on current window dimensions"""
+        # Slides share the window equally, so the first canvas gives the size once it is laid out
+        width, height = self.slide_box(self.slide_frames[0])
+        if width > 1 and height > 1:
+            return (width, height)
+        
         # Get the number of visible slides
         num_slides = self.slides_per_view.get()
         
@@ -397,12 +1108,41 @@ class SlideChooser(tk.Tk):
         # Calculate available height (accounting for buttons and labels)
         available_height = self.winfo_height() - 150  # Approximate space for other UI elements
         
-        # Ensure we have positive dimensions
-        max_dim = max(50, min(available_width, available_height))
-        return (max_dim, max_dim)
+        # Ensure we have positive dimensions; display_size fits each image into this box
+        return (max(50, available_width), max(50, available_height))
+    
+    def display_size(self, image_name, folder_index, box=None):
+        """
+        Size an image version is rendered at: the aspect-correct size that fits the slide
+        box once the image's header has been read, so resizing the window along the side
+        that does not limit the image reuses the cached rendering; otherwise the box itself
+        """
+        box = box or self.get_optimal_image_size()
+        image_size = self.metadata.size(self.folders[folder_index], image_name) if self.metadata is not None else None
+        return fit_size(image_size, box) if image_size is not None else box
+    
+    def slide_tooltip(self, frame):
+        """Dimensions, format, seed and generation text of the image shown in a slide"""
+        if not frame.image_name or self.metadata is None or frame.current_folder_index >= len(self.folders):
+            return ""
+        folder = self.folders[frame.current_folder_index]
+        info = self.metadata.info(folder, frame.image_name)
+        if info is None:
+            return ""
+        width, height, image_format, seed = info
+        summary = f"{frame.image_name}  {width} × {height} {image_format}"
+        lines = [summary if seed is None else f"{summary}, seed {seed}"]
+        text = self.metadata.text(folder, frame.image_name)
+        if text:
+            lines.append(text if len(text) <= TOOLTIP_TEXT_CHARS else text[:TOOLTIP_TEXT_CHARS] + "…")
+        return "\n".join(lines)
 
-    def display_image_in_frame(self, image_name, frame, folder_index=None, force_reload=False):
+    def display_image_in_frame(self, image_name, frame, folder_index=None):
         """Display an image in the specified slide frame"""
+        with perf.span("display_image_in_frame", image=image_name):
+            self._display_image_in_frame(image_name, frame, folder_index)
+    
+    def _display_image_in_frame(self, image_name, frame, folder_index):
         if image_name not in self.image_catalog:
             return
             
@@ -411,106 +1151,313 @@ class SlideChooser(tk.Tk):
         
         # Determine which folder to use
         if folder_index is None:
-            # If image was previously selected, use that folder
-            if image_name in self.selected_images:
-                folder_name = self.selected_images[image_name]
-                folder_index = self.folders.index(folder_name)
-            else:
-                # Otherwise use the first folder
-                folder_index = 0
+            # Use the previously selected folder, otherwise the first folder
+            folder_index = self.default_folder_index(image_name)
         
         frame.current_folder_index = folder_index
         folder_name = self.folders[folder_index]
         
         # Update folder display
-        frame.version_var.set(folder_name)
+        frame.version_var.set(self.version_text(image_name, folder_index))
         
         # Get image path
-        img_path = self.image_catalog[image_name].get(folder_name)
+        img_path = self.image_catalog.path(image_name, folder_index)
         if not img_path:
             # If image doesn't exist in this folder, show placeholder
-            frame.img_label.config(text=f"Image not available in folder: {folder_name}")
+            self.cancel_image(frame)
+            self.show_frame_message(frame, f"Image not available in folder: {folder_name}")
             return
         
         # Load and display image in a separate thread (or use cached version)
-        img_size = self.get_optimal_image_size()
-        cache_key = f"{img_path}_{img_size[0]}x{img_size[1]}"
-        
-        if force_reload or cache_key not in self.image_cache:
-            self.load_queue.put((img_path, frame, img_size))
-            if not hasattr(self, 'loading_thread') or not self.loading_thread.is_alive():
-                self.loading_thread = threading.Thread(target=self.load_images_thread, daemon=True)
-                self.loading_thread.start()
+        box = self.get_optimal_image_size()
+        self.image_cache.set_active_size(box)
+        self.request_image(frame, img_path, self.display_size(image_name, folder_index, box),
+                           lambda img: self.show_frame_image(frame, img), size_tag=box)
+        self.update_cache_status()
+    
+    def show_frame_image(self, frame, img):
+        """Put a loaded image (or an error message if loading failed) into a slide frame"""
+        if img is None:
+            self.show_frame_message(frame, "Error loading image")
         else:
-            # Use cached image
-            frame.img_label.config(image=self.image_cache[cache_key])
+            frame.source = img
+            self.paint_frame(frame, img)
+    
+    def show_frame_message(self, frame, text):
+        """Replace a slide's image with a text message"""
+        frame.source = None
+        frame.img_canvas.itemconfigure(frame.canvas_image, state=tk.HIDDEN)
+        frame.img_canvas.itemconfigure(frame.canvas_text, text=text, state=tk.NORMAL)
     
-    def load_images_thread(self):
-        """Thread to load images in the background"""
+    def paint_frame(self, frame, img):
+        """
+        Copy an image, centred on the slide background, into the slide's PhotoImage buffer.
+        The buffer only grows (in BUFFER_STEP increments), so resizing and navigating
+        reuse the same Tk image instead of allocating a new one per size
+        """
+        box = self.slide_box(frame)
+        with perf.span("paint_frame", width=box[0], height=box[1]):
+            if frame.buffer is None or frame.buffer.width() < box[0] or frame.buffer.height() < box[1]:
+                from PIL import ImageTk
+                size = (-(-box[0] // BUFFER_STEP) * BUFFER_STEP, -(-box[1] // BUFFER_STEP) * BUFFER_STEP)
+                frame.buffer = ImageTk.PhotoImage("RGB", size)
+                frame.img_canvas.itemconfigure(frame.canvas_image, image=frame.buffer)
+            frame.buffer.paste(letterbox(img, box, SLIDE_BACKGROUND))
+            frame.img_canvas.itemconfigure(frame.canvas_text, state=tk.HIDDEN)
+            frame.img_canvas.itemconfigure(frame.canvas_image, state=tk.NORMAL)
+    
+    def request_image(self, slot, img_path, img_size, on_ready, decode_dim=None, priority=PRIORITY_VISIBLE,
+                      size_tag=None):
+        """
+        Show img_path scaled to img_size in a display slot (a slide frame, a contact sheet
+        cell, ...). on_ready(img) is called immediately if the image is cached, otherwise
+        on the Tk thread once it has been decoded (with None if loading failed). A newer
+        request for the same slot supersedes this one. size_tag is the display box the
+        image is cached under (img_size itself by default).
+        """
+        cache_key = (img_path, img_size[0], img_size[1])
+        img = self.image_cache.get(cache_key)
+        if img is not None:
+            # Use cached image, superseding any load still pending for this slot
+            self.cancel_image(slot)
+            on_ready(img)
+            return
+        
+        # Decode on the pool unless a queued job already covers this image and size
+        self.slot_callbacks[slot] = on_ready
+        generation = self.load_scheduler.request(slot, cache_key)
+        if generation is not None:
+            self.loader.decode_pool.submit(self.load_image_job, img_path, img_size, generation, decode_dim,
+                                           size_tag or tuple(img_size), priority=priority)
+            self.schedule_result_poll()
+    
+    def refine_image(self, slot, cache_key, on_ready, size_tag):
+        """
+        Re-render an image that a slot was first shown from a lossy stored preview, this
+        time from the original file. Superseded like any other request for the slot.
+        """
+        self.slot_callbacks[slot] = on_ready
+        generation = self.load_scheduler.request(slot, cache_key)
+        if generation is not None:
+            self.loader.decode_pool.submit(self.load_image_job, cache_key[0], cache_key[1:], generation, None,
+                                           size_tag, False, priority=PRIORITY_REFINE)
+            self.schedule_result_poll()
+    
+    def cancel_image(self, slot):
+        """Forget any pending image request for a display slot"""
+        self.load_scheduler.cancel(slot)
+        self.slot_callbacks.pop(slot, None)
+    
+    def load_image_job(self, img_path, img_size, generation, decode_dim, size_tag, preview=True):
+        """
+        Decode and resize an image on a pool thread (must not touch Tk). preview allows a
+        stored preview; the result is flagged for refining when one was used for a slide.
+        """
+        cache_key = (img_path, img_size[0], img_size[1])
+        # Skip requests superseded while they were waiting in the queue
+        if not self.load_scheduler.claim(cache_key):
+            return
+        try:
+            with perf.span("load_image_job", path=img_path):
+                # Decode the file once into a pyramid and resample from it
+                pyramid = self.loader.get_pyramid(img_path, img_size, decode_dim, preview)
+                if not self.load_scheduler.claim(cache_key, decoded=True):
+                    # Superseded during decode; the pyramid stays cached for later
+                    return
+                with perf.span("resample"):
+                    img = pyramid.render(img_size)  # Resize image to fit in frame
+            self.result_queue.put((cache_key, img, size_tag, pyramid.stored and decode_dim is None))
+        except Exception as e:
+            logger.error(f"Error loading image {img_path} (request {generation}): {str(e)}")
+            self.result_queue.put((cache_key, None, size_tag, False))
+    
+    def schedule_result_poll(self):
+        """Make sure decoded images are drained into Tk on the main thread"""
+        if self._result_poll is None:
+            self._result_poll = self.after(RESULT_POLL_MS, self.process_load_results)
+    
+    def process_load_results(self):
+        """Cache decoded images and hand them to the slots waiting for them (runs on the Tk thread)"""
+        self._result_poll = None
+        refines = []
         while True:
             try:
-                if self.load_queue.empty():
-                    break
-                    
-                img_path, frame, img_size = self.load_queue.get(timeout=1)
-                
-                # Load and resize image
-                img = Image.open(img_path)
-                img.thumbnail(img_size)  # Resize image to fit in frame
-                photo = ImageTk.PhotoImage(img)
-                
-                # Create cache key based on path and size
-                cache_key = f"{img_path}_{img_size[0]}x{img_size[1]}"
-                
-                # Store in cache and update UI in main thread
-                self.image_cache[cache_key] = photo
-                self.after(0, lambda f=frame, p=photo: f.img_label.config(image=p))
-                
+                cache_key, img, size_tag, refine = self.result_queue.get_nowait()
             except queue.Empty:
-                break  # Exit when queue is empty
-            except Exception as e:
-                logger.error(f"Error loading image {img_path}: {str(e)}")
-                self.after(0, lambda f=frame: f.img_label.config(text="Error loading image"))
+                break
+            
+            # Only slots whose latest request is this image receive it
+            slots = self.load_scheduler.finish(cache_key)
+            if img is not None and not refine:
+                # Renders of stored previews are not cached, so they are never shown as final
+                self.image_cache.put(cache_key, img, img.width * img.height * len(img.getbands()),
+                                     size_tag=size_tag)
+            for slot in slots:
+                callback = self.slot_callbacks.pop(slot, None)
+                if callback is not None:
+                    callback(img)
+                    if refine:
+                        refines.append((slot, cache_key, callback, size_tag))
+        
+        self.update_cache_status()
+        self.check_view_complete()
+        for refine in refines:
+            self.refine_image(*refine)
+        # Check busy() first: jobs queue their result before they stop counting as busy
+        if self.loader.decode_pool.busy() or not self.result_queue.empty():
+            self.schedule_result_poll()
+    
+    def check_view_complete(self):
+        """End the keypress-to-pixels interval once no visible slide is still waiting"""
+        if not perf.enabled or not perf.is_open("keypress_to_pixels", self.keypress_id):
+            return
+        num_slides = self.slides_per_view.get()
+        if not any(self.load_scheduler.is_waiting(frame) for frame in self.slide_frames[:num_slides]):
+            perf.end("keypress_to_pixels", self.keypress_id)
     
     def clear_slide_frame(self, frame):
         """Clear a slide frame"""
-        frame.img_label.config(image='', text='No image')
+        self.show_frame_message(frame, 'No image')
         frame.version_var.set('')
         frame.image_name = None
+        self.cancel_image(frame)
+    
+    def load_selection_file(self):
+        """Merge selections from a selection file into the current selection"""
+        path = filedialog.askopenfilename(
+            title="Load Selection",
+            filetypes=[("Selection files", "*.json *.txt"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            selection = load_selection(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error loading selection {path}: {str(e)}")
+            messagebox.showerror("Load Selection", f"Failed to load selection: {str(e)}")
+            return
+        self.selected_images.update(selection)
+        self.journal_selection(selection)
+        self.update_sequence_display()
+        if self.contact_sheet is not None:
+            self.contact_sheet.refresh()
+        self.status_var.set(f"Loaded {len(selection)} selections from {path}")
+    
+    def save_selection_file(self):
+        """Save the current selection for later sessions or the command-line tool"""
+        if not self.selected_images:
+            messagebox.showinfo("Save Selection", "No images have been selected yet")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Save Selection",
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            save_selection(self.selected_images, path)
+        except OSError as e:
+            logger.error(f"Error saving selection {path}: {str(e)}")
+            messagebox.showerror("Save Selection", f"Failed to save selection: {str(e)}")
+            return
+        self.status_var.set(f"Saved {len(self.selected_images)} selections to {path}")
     
     def export_selected(self):
-        """Export selected images to a zip file"""
+        """Export selected images as a zip file or into a folder, as chosen under File > Export As"""
         if not self.selected_images:
             messagebox.showinfo("Export", "No images have been selected yet")
             return
         
         # Ask for export location
-        export_path = filedialog.asksaveasfilename(
-            title="Export Selected Images",
-            defaultextension=".zip",
-            filetypes=[("Zip files", "*.zip"), ("All files", "*.*")]
-        )
+        mode = self.export_mode.get()
+        if mode == "zip":
+            export_path = filedialog.asksaveasfilename(
+                title="Export Selected Images",
+                defaultextension=".zip",
+                filetypes=[("Zip files", "*.zip"), ("All files", "*.*")]
+            )
+        else:
+            export_path = filedialog.askdirectory(title="Export Selected Images to Folder")
         
         if not export_path:
             return
+        
+        # Resolve paths now; the export itself runs in the background. Files are added
+        # with just the image name (not the folder path)
+        items = selection_items(self.image_catalog, self.selected_images)
+        if mode == "zip":
+            compression = self.zip_compression.get()
+            def export_fn(progress, cancel_event):
+                return export_zip(items, export_path, compression, progress, cancel_event)
+        elif mode in TRANSCODE_FORMATS:
+            def export_fn(progress, cancel_event):
+                return export_transcoded(items, export_path, mode, progress=progress, cancel_event=cancel_event)
+        else:
+            def export_fn(progress, cancel_event):
+                return export_copy(items, export_path, progress, cancel_event, method=mode)
+        self.start_export(export_path, len(items), export_fn)
+    
+    def start_export(self, export_path, total, export_fn):
+        """Run export_fn(progress, cancel_event) on a background thread with progress and cancel"""
+        if self.export_cancel is not None:
+            messagebox.showinfo("Export", "An export is already running")
+            return
+        
+        self.export_cancel = threading.Event()
+        self.progress["maximum"] = max(1, total)
+        self.progress["value"] = 0
+        self.cancel_button.pack(side=tk.RIGHT, padx=5, pady=2)
+        self.status_var.set(f"Exporting {total} images...")
+        
+        def run(cancel_event):
+            try:
+                count = export_fn(lambda done, total: self.export_queue.put(("progress", done, total)),
+                                  cancel_event)
+                self.export_queue.put(("done", count, export_path))
+            except ExportCancelled:
+                self.export_queue.put(("cancelled", None, export_path))
+            except Exception as e:
+                logger.error(f"Error exporting images: {str(e)}")
+                self.export_queue.put(("error", str(e), export_path))
+        
+        threading.Thread(target=run, args=(self.export_cancel,), daemon=True).start()
+        self.after(EXPORT_POLL_MS, self.process_export_events)
+    
+    def cancel_export(self):
+        """Ask the running export to stop"""
+        if self.export_cancel is not None:
+            self.export_cancel.set()
+            self.status_var.set("Cancelling export...")
+    
+    def process_export_events(self):
+        """Apply export progress on the Tk thread"""
+        while True:
+            try:
+                kind, value, extra = self.export_queue.get_nowait()
+            except queue.Empty:
+                break
             
-        try:
-            # Create a zip file
-            with zipfile.ZipFile(export_path, 'w') as zipf:
-                for img_name, folder_name in self.selected_images.items():
-                    img_path = self.image_catalog[img_name].get(folder_name)
-                    if img_path and os.path.exists(img_path):
-                        # Add file to zip with just the image name (not the folder path)
-                        zipf.write(img_path, img_name)
-            
-            messagebox.showinfo("Export Successful", 
-                               f"Successfully exported {len(self.selected_images)} images to {export_path}")
+            if kind == "progress":
+                self.progress["value"] = value
+                self.status_var.set(f"Exporting images... {value}/{extra}")
+                continue
             
-            logger.info(f"Exported {len(self.selected_images)} images to {export_path}")
-        
-        except Exception as e:
-            logger.error(f"Error exporting images: {str(e)}")
-            messagebox.showerror("Export Error", f"Failed to export images: {str(e)}")
+            # The export finished one way or another
+            self.export_cancel = None
+            self.cancel_button.pack_forget()
+            if kind == "done":
+                self.status_var.set(f"Exported {value} images")
+                logger.info(f"Exported {value} images to {extra}")
+                messagebox.showinfo("Export Successful", f"Successfully exported {value} images to {extra}")
+            elif kind == "cancelled":
+                self.status_var.set("Export cancelled")
+                logger.info(f"Export to {extra} cancelled")
+            else:
+                self.status_var.set("Export failed")
+                messagebox.showerror("Export Error", f"Failed to export images: {value}")
+            return
+        self.after(EXPORT_POLL_MS, self.process_export_events)
     
     def show_about(self):
         """Show the about dialog"""
@@ -520,9 +1467,14 @@ class SlideChooser(tk.Tk):
                             "across multiple batches of similar prompts.")
 
 if __name__ == "__main__":
+    app = None
     try:
         app = SlideChooser()
         app.mainloop()
     except Exception as e:
         logging.error(f"Application error: {str(e)}", exc_info=True)
-        messagebox.showerror("Application Error", f"An unexpected error occurred: {str(e)}")
\ No newline at end of file
+        messagebox.showerror("Application Error", f"An unexpected error occurred: {str(e)}")
+    finally:
+        # Runs after a crash too, so journaled selections queued just before it are written
+        if app is not None:
+            app.shutdown()
\ No newline at end of file
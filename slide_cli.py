@@ -0,0 +1,183 @@
+# slide_cli.py
+"""
+Command-line front end for Slide Chooser: scan a master folder and export a selection
+without starting the GUI.
+
+    python slide_cli.py scan MASTER_FOLDER [--json]
+    python slide_cli.py index MASTER_FOLDER
+    python slide_cli.py export MASTER_FOLDER --selection picks.json --zip selected.zip
+    python slide_cli.py export MASTER_FOLDER --selection picks.txt --copy selected_dir [--method link]
+    python slide_cli.py export MASTER_FOLDER --selection picks.json --transcode deliverables [--format webp]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import slide_core
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressPrinter:
+    """Throttled progress line on stderr (silent when stderr is not a terminal)"""
+
+    def __init__(self, label):
+        self.label = label
+        self.enabled = sys.stderr.isatty()
+        self._last = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if self.enabled and (done == total or now - self._last >= 0.1):
+            self._last = now
+            sys.stderr.write(f"\r{self.label}: {done}/{total}")
+            if done == total:
+                sys.stderr.write("\n")
+            sys.stderr.flush()
+
+
+def cmd_scan(args):
+    """Scan a master folder and print a summary (or the full catalog as JSON)"""
+    started = time.perf_counter()
+    catalog = slide_core.build_catalog(args.master_folder, args.workers)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        data = {
+            "master_folder": args.master_folder,
+            "folders": catalog.folders,
+            "images": {name: [catalog.folders[i] for i in catalog.versions(name)]
+                       for name in sorted(catalog.names())},
+        }
+        json.dump(data, sys.stdout, indent=1)
+        sys.stdout.write("\n")
+    else:
+        print(f"{len(catalog.folders)} folders, {len(catalog)} unique images ({elapsed:.2f}s)")
+    return 0
+
+
+def cmd_index(args):
+    """Build or refresh the metadata index (image headers) and the similarity index (hashes and quality scores)"""
+    catalog = slide_core.build_catalog(args.master_folder)
+    metadata = slide_core.MetadataIndex(args.master_folder).load()
+    started = time.perf_counter()
+    read = metadata.update(catalog, workers=args.metadata_workers, progress=ProgressPrinter("Reading headers"),
+                           background=False)
+    print(f"Read {read} image headers ({time.perf_counter() - started:.2f}s)")
+    index = slide_core.SimilarityIndex(args.master_folder).load()
+    started = time.perf_counter()
+    computed = index.update(catalog, workers=args.workers, progress=ProgressPrinter("Analysing"), background=False)
+    elapsed = time.perf_counter() - started
+    duplicates = sum(len(group) - 1 for name in catalog.names() for group in index.version_groups(catalog, name))
+    print(f"Analysed {computed} images ({elapsed:.2f}s); {duplicates} versions are near-duplicates of a better one")
+    return 0
+
+
+def cmd_export(args):
+    """Export a selection from a master folder as a ZIP archive, a folder of copies or links, or resized images"""
+    catalog = slide_core.build_catalog(args.master_folder, args.workers)
+    if args.selection:
+        selection = slide_core.load_selection(args.selection)
+    elif args.best_version:
+        # --best-version: the highest scoring version of every image (first folder if unscored)
+        index = slide_core.SimilarityIndex(args.master_folder).load()
+        index.update(catalog, progress=ProgressPrinter("Analysing"))
+        selection = {}
+        for name in catalog.names():
+            best = index.best_version(catalog, name)
+            selection[name] = catalog.folders[best if best is not None else catalog.first_folder(name)]
+    else:
+        # --first-version: every image from the first folder that contains it
+        selection = {name: catalog.folders[catalog.first_folder(name)] for name in catalog.names()}
+    items = slide_core.selection_items(catalog, selection)
+    if not items:
+        logger.error("Nothing to export: no selected image was found in the master folder")
+        return 1
+
+    started = time.perf_counter()
+    progress = ProgressPrinter("Exporting")
+    if args.zip:
+        count = slide_core.export_zip(items, args.zip, args.compression, progress)
+        destination = args.zip
+    elif args.transcode:
+        count = slide_core.export_transcoded(items, args.transcode, args.format, args.max_size, args.quality,
+                                             progress, workers=args.transcode_workers)
+        destination = args.transcode
+    else:
+        count = slide_core.export_copy(items, args.copy, progress, method=args.method)
+        destination = args.copy
+    elapsed = time.perf_counter() - started
+
+    print(f"Exported {count} of {len(selection)} selected images to {destination} ({elapsed:.2f}s)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="slide_cli", description="Headless Slide Chooser tools")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress details to stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="scan a master folder and summarise its catalog")
+    scan.add_argument("master_folder")
+    scan.add_argument("--json", action="store_true", help="print the catalog as JSON")
+    scan.add_argument("--workers", type=int, default=slide_core.DEFAULT_SCAN_WORKERS,
+                      help="subfolders to list concurrently")
+    scan.set_defaults(func=cmd_scan)
+
+    index = subparsers.add_parser("index", help="read image headers and analyse images for duplicate grouping "
+                                                 "and quality ranking")
+    index.add_argument("master_folder")
+    # No display competes for the cores here, so both passes use all of them by default
+    index.add_argument("--metadata-workers", type=int, default=slide_core.DEFAULT_METADATA_WORKERS,
+                       help="worker processes reading image headers (default: one per CPU)")
+    index.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="worker processes analysing images (default: one per CPU)")
+    index.set_defaults(func=cmd_index)
+
+    export = subparsers.add_parser("export", help="export selected images")
+    export.add_argument("master_folder")
+    source = export.add_mutually_exclusive_group(required=True)
+    source.add_argument("--selection", help="selection file (.json mapping, or folder/image_name lines)")
+    source.add_argument("--first-version", action="store_true",
+                        help="export every image from the first folder that contains it")
+    source.add_argument("--best-version", action="store_true",
+                        help="export the highest scoring version of every image (builds the similarity index)")
+    target = export.add_mutually_exclusive_group(required=True)
+    target.add_argument("--zip", help="write a ZIP archive")
+    target.add_argument("--copy", help="copy (or link, see --method) the files into this folder")
+    target.add_argument("--transcode", help="write resized, re-encoded images into this folder")
+    export.add_argument("--compression", choices=slide_core.ZIP_COMPRESSION_MODES, default="auto",
+                        help="ZIP compression mode (default: auto)")
+    export.add_argument("--method", choices=slide_core.EXPORT_COPY_METHODS, default="copy",
+                        help="how --copy places files: link uses reflinks or hardlinks where possible "
+                             "(default: copy)")
+    export.add_argument("--format", choices=sorted(slide_core.TRANSCODE_FORMATS), default="webp",
+                        help="--transcode output format (default: webp)")
+    export.add_argument("--max-size", type=int, default=slide_core.TRANSCODE_MAX_DIM,
+                        help=f"--transcode longest side in pixels (default: {slide_core.TRANSCODE_MAX_DIM})")
+    export.add_argument("--quality", type=int, default=slide_core.TRANSCODE_QUALITY,
+                        help=f"--transcode WebP/JPEG quality (default: {slide_core.TRANSCODE_QUALITY})")
+    export.add_argument("--transcode-workers", type=int, default=slide_core.DEFAULT_TRANSCODE_WORKERS,
+                        help="--transcode worker processes (default: one per CPU)")
+    export.add_argument("--workers", type=int, default=slide_core.DEFAULT_SCAN_WORKERS,
+                        help="subfolders to list concurrently")
+    export.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format='%(levelname)s: %(message)s')
+    try:
+        return args.func(args)
+    except (OSError, ValueError, slide_core.ExportCancelled) as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2263 @@
+# slide_core.py
+"""
+GUI-free core of Slide Chooser: folder scanning and the image catalog, the decode
+pipeline and its caches, selections, and export.
+
+Nothing here imports tkinter, and Pillow, zipfile and multiprocessing are only imported
+when they are first used, so the application and command-line tools built on this
+module start quickly.
+"""
+import os
+import re
+import errno
+import bisect
+import shutil
+import threading
+import queue
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import sqlite3
+import io
+import json
+import gzip
+import hashlib
+import math
+import time
+import sys
+import contextlib
+import functools
+import array
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Default memory budget for decoded display images (override with SLIDE_CHOOSER_CACHE_MB)
+DEFAULT_CACHE_BUDGET_MB = 512
+
+# Decoded image pyramids: the largest level kept per image and the memory budget for all
+# pyramids (override with SLIDE_CHOOSER_PYRAMID_MAX and SLIDE_CHOOSER_PYRAMID_MB)
+PYRAMID_MAX_DIM = 2048
+PYRAMID_MIN_DIM = 128
+DEFAULT_PYRAMID_BUDGET_MB = 768
+
+# Persistent thumbnail store: previews are saved at the smallest bucket that fits the display.
+# Once the stored previews exceed the budget (override with SLIDE_CHOOSER_THUMBNAIL_MB), the
+# least recently used are pruned down to THUMBNAIL_PRUNE_TARGET of it. Access times are only
+# rewritten once they are THUMBNAIL_TOUCH_SECONDS old, so reads rarely write. At most
+# THUMBNAIL_PENDING_WRITES previews wait to be written (each holds a decoded pyramid in
+# memory); previews decoded while that many are queued are not stored.
+THUMBNAIL_BUCKETS = (256, 512, 1024, 2048)
+THUMBNAIL_DB_NAME = "thumbnails.sqlite3"
+THUMBNAIL_SCHEMA_VERSION = 2
+DEFAULT_THUMBNAIL_BUDGET_MB = 1024
+THUMBNAIL_PRUNE_TARGET = 0.8
+THUMBNAIL_TOUCH_SECONDS = 3600
+THUMBNAIL_PENDING_WRITES = 16
+
+# Decode workers (override with SLIDE_CHOOSER_DECODE_WORKERS). Files larger than
+# SLIDE_CHOOSER_PROCESS_DECODE_MB are decoded in a separate process; 0 disables this.
+DEFAULT_DECODE_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_PROCESS_DECODE_MB = 0
+
+# Settings remembered between sessions, in the user cache directory
+APP_STATE_NAME = "state.json"
+
+# Image files picked up by the folder scan
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+# Subfolders listed concurrently while scanning (override with SLIDE_CHOOSER_SCAN_WORKERS)
+DEFAULT_SCAN_WORKERS = 8
+
+# Persisted catalog indexes (one per master folder) in the user cache directory
+CATALOG_INDEX_DIR = "catalogs"
+CATALOG_INDEX_VERSION = 1
+# Folder mtimes this close to the time of the previous scan are not trusted, since files
+# written in the same timestamp tick would not have changed the mtime
+RACY_MTIME_NS = 2 * 10**9
+
+# Watching an open master folder: bursts of changes are applied once no new change has
+# arrived for WATCH_DEBOUNCE_MS, but at least every WATCH_MAX_DELAY_MS during a long burst.
+# Without the optional watchdog package, subfolder mtimes are polled instead (override the
+# interval with SLIDE_CHOOSER_WATCH_POLL_MS; SLIDE_CHOOSER_WATCH=0 turns watching off).
+WATCH_DEBOUNCE_MS = 500
+WATCH_MAX_DELAY_MS = 3000
+DEFAULT_WATCH_POLL_MS = 2000
+
+# Similarity index: perceptual hashes and quality stats for every image, computed across a
+# process pool (override the worker count with SLIDE_CHOOSER_SIMILARITY_WORKERS; by default
+# half the cores, leaving the rest to the decode pool serving the screen) and stored
+# next to the catalog index. Versions whose 64-bit hashes differ in at most
+# DUPLICATE_HASH_DISTANCE bits count as near-duplicates. Stored signatures are discarded
+# when SIMILARITY_INDEX_VERSION changes, so scores from different algorithms never mix.
+SIMILARITY_INDEX_VERSION = 2
+SIMILARITY_ANALYSIS_DIM = 256
+SIMILARITY_CHUNK = 64
+DEFAULT_SIMILARITY_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+# Background indexing workers run at lower OS priority than the application
+BACKGROUND_NICENESS = 10
+DUPLICATE_HASH_DISTANCE = 6
+
+# Metadata index: dimensions, format, seed and generation text read from image headers
+# (no pixel data is decoded) across a process pool, in larger chunks than similarity
+# analysis since a header costs far less than a decode. Only the first
+# METADATA_TEXT_LIMIT characters of the generation text are kept.
+METADATA_CHUNK = 1024
+METADATA_SORT_ORDERS = ("resolution", "seed")
+METADATA_TEXT_LIMIT = 2000
+DEFAULT_METADATA_WORKERS = os.cpu_count() or 1
+# PNG text chunks holding generation parameters (Automatic1111, ComfyUI and others), most
+# useful first, and the EXIF tags used for the same purpose in JPEG and WebP files
+GENERATION_TEXT_KEYS = ("parameters", "prompt", "Description", "description", "Comment", "comment")
+EXIF_IFD_TAG = 0x8769
+EXIF_USER_COMMENT = 0x9286
+EXIF_IMAGE_DESCRIPTION = 0x010E
+SEED_PATTERN = re.compile(r'\b(?:noise_)?seed"?\s*[:=]\s*"?(\d+)', re.IGNORECASE)
+
+# ZIP export: formats that are already compressed are stored as-is in "auto" mode.
+# Files are read in parallel ahead of the archive writer; very large files are streamed.
+PRECOMPRESSED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+ZIP_COMPRESSION_MODES = ("auto", "stored", "deflate") + (("zstd",) if sys.version_info >= (3, 14) else ())
+EXPORT_DEFLATE_LEVEL = 6
+EXPORT_READ_WORKERS = 8
+EXPORT_READ_AHEAD = 16
+EXPORT_STREAM_BYTES = 64 * 2**20
+
+# Decode job priorities (lower runs first); prefetch jobs add their distance from the view.
+# Visible slides first painted from a stored preview are then refined from the original.
+# Thumbnail store writes run once nothing else is waiting for a decode thread.
+PRIORITY_VISIBLE = 0
+PRIORITY_REFINE = 5
+PRIORITY_PREFETCH = 10
+PRIORITY_STORE = 100
+
+# Files copied concurrently when exporting to a folder, and how they are placed there:
+# "link" reflinks (copy-on-write clones) where the filesystem supports it, otherwise
+# hardlinks, otherwise copies; "reflink" and "hardlink" fail instead of falling back
+EXPORT_COPY_WORKERS = 8
+EXPORT_COPY_METHODS = ("copy", "link", "reflink", "hardlink")
+
+# Transcoded export: output formats as (file extension, Pillow format), and the default
+# longest side and encoder quality of the deliverables
+TRANSCODE_FORMATS = {"webp": (".webp", "WEBP"), "jpeg": (".jpg", "JPEG"), "png": (".png", "PNG")}
+TRANSCODE_MAX_DIM = 2048
+TRANSCODE_QUALITY = 90
+DEFAULT_TRANSCODE_WORKERS = os.cpu_count() or 1
+
+# Selection journal: the append-only log of a master folder's selection changes is
+# rewritten as a single snapshot once it holds this many records (and more than twice
+# as many records as there are selections)
+JOURNAL_COMPACT_RECORDS = 5000
+
+# Trace events kept by the performance recorder (oldest are dropped first)
+PERF_MAX_EVENTS = 200000
+
+
+def env_int(name, default):
+    """Read a positive integer setting from the environment"""
+    try:
+        value = int(os.environ.get(name, default))
+    except ValueError:
+        logger.warning(f"Ignoring invalid value for {name}: {os.environ.get(name)!r}")
+        return default
+    return value if value > 0 else default
+
+
+def user_cache_dir():
+    """Per-user directory for persistent Slide Chooser data (override with SLIDE_CHOOSER_CACHE_DIR)"""
+    override = os.environ.get("SLIDE_CHOOSER_CACHE_DIR")
+    if override:
+        return override
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base, "SlideChooser")
+
+
+def load_app_state():
+    """Settings remembered between sessions (such as the last master folder), or {}"""
+    try:
+        with open(os.path.join(user_cache_dir(), APP_STATE_NAME), encoding="utf-8") as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable application state: {str(e)}")
+        return {}
+
+
+def save_app_state(state):
+    """Atomically replace the settings remembered between sessions"""
+    path = os.path.join(user_cache_dir(), APP_STATE_NAME)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Error saving application state {path}: {str(e)}")
+
+
+def list_subfolders(master_folder):
+    """Sorted (name, mtime_ns) pairs for the immediate subfolders of master_folder"""
+    with os.scandir(master_folder) as entries:
+        return sorted((entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.is_dir())
+
+
+def scan_image_folder(folder_path):
+    """
+    Names of the image files directly inside folder_path. Uses the file type cached in
+    each DirEntry, so no per-file stat is needed on platforms that report it.
+    """
+    with os.scandir(folder_path) as entries:
+        return [entry.name for entry in entries
+                if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file()]
+
+
+class ImageCatalog:
+    """
+    Compact record of which image names exist in which batch folders.
+
+    Folder names and image names are each stored once; a folder is identified by its
+    index in folders, and each image name maps to a bitmask of the folder indices that
+    contain it. Full paths are built on demand.
+    """
+
+    def __init__(self, master_folder=None, folders=()):
+        self.master_folder = master_folder
+        self.folders = list(folders)
+        self._folder_ids = {folder: i for i, folder in enumerate(self.folders)}
+        self._presence = {}  # Structure: {image_name: bitmask of folder indices}
+
+    def __contains__(self, image_name):
+        return image_name in self._presence
+
+    def __len__(self):
+        return len(self._presence)
+
+    def names(self):
+        """All image names (unsorted)"""
+        return self._presence.keys()
+
+    def folder_index(self, folder):
+        """Index of a folder name, or None if it is not part of the catalog"""
+        return self._folder_ids.get(folder)
+
+    def add_folder(self, folder):
+        """Register a folder (if new) and return its index"""
+        folder_index = self._folder_ids.get(folder)
+        if folder_index is None:
+            folder_index = len(self.folders)
+            self.folders.append(folder)
+            self._folder_ids[folder] = folder_index
+        return folder_index
+
+    def insert_folder(self, folder):
+        """
+        Register a folder (if new) at its sorted position and return its index. Folders
+        after it are renumbered, so indices held elsewhere must be looked up again.
+        """
+        folder_index = self._folder_ids.get(folder)
+        if folder_index is not None:
+            return folder_index
+        folder_index = bisect.bisect(self.folders, folder)
+        self.folders.insert(folder_index, folder)
+        self._folder_ids = {name: i for i, name in enumerate(self.folders)}
+        low = (1 << folder_index) - 1
+        presence = self._presence
+        for name, bits in presence.items():
+            if bits >> folder_index:
+                presence[name] = (bits & low) | (bits >> folder_index << (folder_index + 1))
+        return folder_index
+
+    def remove_folder(self, folder):
+        """
+        Forget a folder and the image versions it held; images left without any version
+        are dropped. Folders after it are renumbered.
+        """
+        folder_index = self._folder_ids.get(folder)
+        if folder_index is None:
+            return
+        del self.folders[folder_index]
+        self._folder_ids = {name: i for i, name in enumerate(self.folders)}
+        low = (1 << folder_index) - 1
+        presence = self._presence
+        for name, bits in list(presence.items()):
+            bits = (bits & low) | (bits >> (folder_index + 1) << folder_index)
+            if bits:
+                presence[name] = bits
+            else:
+                del presence[name]
+
+    def add(self, folder, names):
+        """Record that folder contains the given image names"""
+        bit = 1 << self.add_folder(folder)
+        presence = self._presence
+        for name in names:
+            presence[name] = presence.get(name, 0) | bit
+
+    def discard(self, folder_index, names):
+        """Record that the folder at folder_index no longer contains the given image names"""
+        mask = ~(1 << folder_index)
+        presence = self._presence
+        for name in names:
+            bits = presence.get(name, 0) & mask
+            if bits:
+                presence[name] = bits
+            else:
+                presence.pop(name, None)
+
+    def copy(self):
+        """Snapshot that background threads can read while this catalog keeps changing"""
+        snapshot = ImageCatalog(self.master_folder, self.folders)
+        snapshot._presence = dict(self._presence)
+        return snapshot
+
+    def folder_names(self, folder_index):
+        """Image names present in the folder at folder_index (visits every image name)"""
+        return [name for name, bits in self._presence.items() if bits >> folder_index & 1]
+
+    def has(self, image_name, folder_index):
+        """Whether the folder at folder_index contains image_name"""
+        return bool(self._presence.get(image_name, 0) >> folder_index & 1)
+
+    def path(self, image_name, folder_index):
+        """Full path of an image version, or None if that folder does not contain it"""
+        if folder_index is None or not self.has(image_name, folder_index):
+            return None
+        return os.path.join(self.master_folder, self.folders[folder_index], image_name)
+
+    def versions(self, image_name):
+        """Indices of the folders that contain image_name, in folder order"""
+        presence = self._presence.get(image_name, 0)
+        return [i for i in range(presence.bit_length()) if presence >> i & 1]
+
+    def first_folder(self, image_name):
+        """Index of the first folder containing image_name, or None"""
+        presence = self._presence.get(image_name, 0)
+        return (presence & -presence).bit_length() - 1 if presence else None
+
+    def next_folder(self, image_name, folder_index, direction):
+        """
+        Index of the next folder (wrapping around) in the given direction that contains
+        image_name, or None if no folder does
+        """
+        presence = self._presence.get(image_name, 0)
+        if not presence:
+            return None
+        if direction > 0:
+            above = presence >> (folder_index + 1)
+            if above:
+                return folder_index + (above & -above).bit_length()
+            return (presence & -presence).bit_length() - 1
+        below = presence & ((1 << max(folder_index, 0)) - 1)
+        if below:
+            return below.bit_length() - 1
+        return presence.bit_length() - 1
+
+
+class CatalogIndex:
+    """
+    Persisted listing of a master folder: the image names found in each subfolder,
+    together with the subfolder's mtime when it was listed.
+
+    On reopen, subfolders whose mtime is unchanged reuse their stored listing, so an
+    unchanged master folder costs one stat per subfolder rather than one per image.
+    """
+
+    def __init__(self, master_folder, folders=None, scanned_at_ns=0):
+        self.master_folder = master_folder
+        self.folders = folders or {}  # Structure: {folder_name: (mtime_ns, [image_names])}
+        self.scanned_at_ns = scanned_at_ns
+
+    @staticmethod
+    def path_for(master_folder, suffix=".json.gz"):
+        """Index file location for a master folder (other per-folder data uses another suffix)"""
+        digest = hashlib.sha1(os.path.abspath(master_folder).encode("utf-8")).hexdigest()
+        return os.path.join(user_cache_dir(), CATALOG_INDEX_DIR, f"{digest}{suffix}")
+
+    @classmethod
+    def load(cls, master_folder):
+        """Load the stored index for master_folder, or an empty one"""
+        try:
+            with gzip.open(cls.path_for(master_folder), "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CATALOG_INDEX_VERSION or data.get("master_folder") != master_folder:
+                return cls(master_folder)
+            folders = {name: (entry[0], entry[1]) for name, entry in data["folders"].items()}
+            return cls(master_folder, folders, data["scanned_at_ns"])
+        except FileNotFoundError:
+            return cls(master_folder)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable catalog index for {master_folder}: {str(e)}")
+            return cls(master_folder)
+
+    def lookup(self, folder, mtime_ns):
+        """Stored image names for folder if its mtime is unchanged (and trustworthy), else None"""
+        entry = self.folders.get(folder)
+        if entry is None or entry[0] != mtime_ns or mtime_ns >= self.scanned_at_ns - RACY_MTIME_NS:
+            return None
+        return entry[1]
+
+    def save(self):
+        """Write the index atomically"""
+        path = self.path_for(self.master_folder)
+        data = {
+            "version": CATALOG_INDEX_VERSION,
+            "master_folder": self.master_folder,
+            "scanned_at_ns": self.scanned_at_ns,
+            "folders": {name: [mtime_ns, names] for name, (mtime_ns, names) in self.folders.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=5) as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Error saving catalog index for {self.master_folder}: {str(e)}")
+
+
+def scan_master_folder(master_folder, workers=DEFAULT_SCAN_WORKERS, is_cancelled=None):
+    """
+    Scan a master folder, reusing the persisted listing of unchanged subfolders and
+    listing the rest concurrently.
+
+    Yields ("folders", [folder names]) once, then ("batch", (folder, [image names])) for
+    each subfolder as soon as its contents are known. Stops early if is_cancelled()
+    becomes true. Raises ValueError if the master folder has no subfolders.
+    """
+    # Get all immediate subfolders (one stat each)
+    scan_started_ns = time.time_ns()
+    subfolders = list_subfolders(master_folder)
+    if not subfolders:
+        raise ValueError("No subfolders found in master folder")
+    yield "folders", [name for name, _ in subfolders]
+    
+    # Publish subfolders whose listing is unchanged since the last scan straight away
+    index = CatalogIndex.load(master_folder)
+    new_index = CatalogIndex(master_folder, scanned_at_ns=scan_started_ns)
+    stale = []
+    total_images = 0
+    for folder, mtime_ns in subfolders:
+        names = index.lookup(folder, mtime_ns)
+        if names is None:
+            stale.append((folder, mtime_ns))
+            continue
+        new_index.folders[folder] = (mtime_ns, names)
+        total_images += len(names)
+        yield "batch", (folder, names)
+    
+    # List changed subfolders in parallel and publish each as a catalog batch
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(scan_image_folder, os.path.join(master_folder, folder)): (folder, mtime_ns)
+                   for folder, mtime_ns in stale}
+        for future in as_completed(futures):
+            if is_cancelled is not None and is_cancelled():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            folder, mtime_ns = futures[future]
+            try:
+                names = future.result()
+                new_index.folders[folder] = (mtime_ns, names)
+            except OSError as e:
+                logger.error(f"Error scanning folder {folder}: {str(e)}")
+                names = []
+            total_images += len(names)
+            yield "batch", (folder, names)
+    
+    if stale or len(new_index.folders) != len(index.folders):
+        new_index.save()
+    
+    # Log catalog info
+    logger.info(f"Scanned master folder: {master_folder}")
+    logger.info(f"Found {len(subfolders)} subfolders ({len(stale)} rescanned) "
+                f"and {total_images} image files")
+
+
+def build_catalog(master_folder, workers=DEFAULT_SCAN_WORKERS):
+    """Scan a master folder to completion and return its ImageCatalog"""
+    catalog = ImageCatalog(master_folder)
+    for kind, payload in scan_master_folder(master_folder, workers):
+        if kind == "folders":
+            for folder in payload:
+                catalog.add_folder(folder)
+        else:
+            catalog.add(*payload)
+    return catalog
+
+
+class _WatchHandler:
+    """watchdog event handler that reports (subfolder, image name or None) for each event"""
+
+    def __init__(self, master_folder, events):
+        self.master_folder = master_folder
+        self.events = events
+
+    def dispatch(self, event):
+        # Ignore opened/closed_no_write, which the app itself causes by reading images
+        if event.event_type not in ("created", "deleted", "moved", "modified", "closed"):
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        for path in filter(None, paths):
+            parts = os.path.relpath(os.fsdecode(path), self.master_folder).split(os.sep)
+            if len(parts) == 1 and event.is_directory and parts[0] not in (".", ".."):
+                # A subfolder was created, deleted or renamed
+                self.events.put((parts[0], None))
+            elif len(parts) == 2 and not event.is_directory and parts[1].lower().endswith(IMAGE_EXTENSIONS):
+                modified = parts[1] if event.event_type in ("modified", "closed") else None
+                self.events.put((parts[0], modified))
+
+
+class FolderWatcher:
+    """
+    Watches an open master folder for images being added, removed or rewritten.
+
+    Uses the optional watchdog package (inotify, FSEvents or ReadDirectoryChangesW) when it
+    is installed, otherwise polls subfolder mtimes. Changes are collected into debounced
+    batches; for each batch the changed subfolders are listed again on the watcher thread
+    and on_change(listings, modified) is called there, with listings mapping each changed
+    subfolder to its image names (None if it was removed) and modified holding the
+    (subfolder, image name) pairs rewritten in place (only reported by watchdog).
+    """
+
+    def __init__(self, master_folder, known_folders, on_change, poll_interval_ms=DEFAULT_WATCH_POLL_MS):
+        self.master_folder = master_folder
+        self.known_folders = set(known_folders)
+        self.on_change = on_change
+        self.poll_interval = poll_interval_ms / 1000
+        self.mode = None  # "watchdog" or "polling" once started
+        self._events = queue.Queue()  # (subfolder, modified image name or None)
+        self._mtimes = {}  # Structure: {subfolder: mtime_ns} as last polled
+        self._observer = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching in the background"""
+        try:
+            from watchdog.observers import Observer
+            self._observer = Observer()
+            self._observer.schedule(_WatchHandler(self.master_folder, self._events), self.master_folder,
+                                    recursive=True)
+            self._observer.start()
+            self.mode = "watchdog"
+        except ImportError:
+            self._observer = None
+            self.mode = "polling"
+        except OSError as e:
+            logger.warning(f"Falling back to polling {self.master_folder}: {str(e)}")
+            self._observer = None
+            self.mode = "polling"
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching (pending changes are dropped)"""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _changed_since_scan(self):
+        """
+        Subfolders that changed between the catalog scan and the start of watching: ones
+        whose mtime no longer matches the persisted index, plus added and removed ones
+        """
+        index = CatalogIndex.load(self.master_folder)
+        self._mtimes = dict(list_subfolders(self.master_folder))
+        changed = {folder for folder, mtime_ns in self._mtimes.items() if index.lookup(folder, mtime_ns) is None}
+        return changed | (self.known_folders ^ self._mtimes.keys())
+
+    def _poll(self):
+        """Subfolders whose mtime changed (or that appeared or vanished) since the last poll"""
+        current = dict(list_subfolders(self.master_folder))
+        changed = {folder for folder, mtime_ns in current.items() if self._mtimes.get(folder) != mtime_ns}
+        changed |= self._mtimes.keys() - current.keys()
+        self._mtimes = current
+        return changed
+
+    def _run(self):
+        """Collect change notifications into debounced batches and publish them"""
+        try:
+            dirty = self._changed_since_scan()
+        except OSError as e:
+            logger.error(f"Error checking {self.master_folder} for changes: {str(e)}")
+            dirty = set()
+        modified = set()
+        burst_started = time.monotonic() if dirty else None
+        while not self._stop.is_set():
+            timeout = self.poll_interval if burst_started is None else WATCH_DEBOUNCE_MS / 1000
+            try:
+                folder, name = self._events.get(timeout=timeout)
+            except queue.Empty:
+                folder = None
+            
+            if folder is not None:
+                # Keep collecting until the burst goes quiet (or has lasted too long)
+                dirty.add(folder)
+                if name is not None:
+                    modified.add((folder, name))
+                if burst_started is None:
+                    burst_started = time.monotonic()
+                if time.monotonic() - burst_started < WATCH_MAX_DELAY_MS / 1000:
+                    continue
+            elif burst_started is None:
+                # Idle for a whole poll interval
+                if self._observer is None:
+                    try:
+                        dirty = self._poll()
+                    except OSError as e:
+                        logger.error(f"Error polling {self.master_folder}: {str(e)}")
+                    if dirty:
+                        burst_started = time.monotonic()
+                continue
+            
+            if not self._stop.is_set():
+                self._publish(dirty, modified)
+            dirty, modified, burst_started = set(), set(), None
+
+    def _publish(self, dirty, modified):
+        """List the changed subfolders again and hand the result to on_change"""
+        listings = {}
+        for folder in sorted(dirty):
+            try:
+                listings[folder] = scan_image_folder(os.path.join(self.master_folder, folder))
+            except (FileNotFoundError, NotADirectoryError):
+                listings[folder] = None
+            except OSError as e:
+                logger.error(f"Error scanning folder {folder}: {str(e)}")
+        modified = {(folder, name) for folder, name in modified if listings.get(folder)}
+        if listings:
+            logger.info(f"Detected changes in {len(listings)} folders of {self.master_folder}")
+            self.on_change(listings, modified)
+
+
+def _numpy():
+    """The numpy module if it is installed (it is optional), else None"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def image_signature(img_path):
+    """
+    Perceptual and quality statistics of an image: (dhash, sharpness, brightness, clipped).
+
+    dhash is a 64-bit difference hash of a 9x8 greyscale thumbnail. sharpness is the
+    variance of the Laplacian of a greyscale preview (higher is sharper), brightness its
+    mean (0-255) and clipped the fraction of pixels that are pure black or white.
+    """
+    from PIL import Image, ImageFilter
+    with Image.open(img_path) as img:
+        if img.format == "JPEG":
+            img.draft("L", (SIMILARITY_ANALYSIS_DIM, SIMILARITY_ANALYSIS_DIM))
+        gray = img.convert("L")
+    gray.thumbnail((SIMILARITY_ANALYSIS_DIM, SIMILARITY_ANALYSIS_DIM), Image.Resampling.BILINEAR)
+    small = gray.resize((9, 8), Image.Resampling.BILINEAR)
+    
+    histogram = gray.histogram()
+    brightness = sum(i * count for i, count in enumerate(histogram)) / max(1, sum(histogram))
+    clipped = (sum(histogram[:3]) + sum(histogram[253:])) / max(1, sum(histogram))
+    
+    np = _numpy()
+    if np is not None:
+        px = np.asarray(small, dtype=np.int16)
+        dhash = int.from_bytes(np.packbits(px[:, 1:] > px[:, :-1]).tobytes(), "big")
+        a = np.asarray(gray, dtype=np.float32)
+        laplacian = 4 * a[1:-1, 1:-1] - a[:-2, 1:-1] - a[2:, 1:-1] - a[1:-1, :-2] - a[1:-1, 2:]
+        sharpness = float(laplacian.var())
+    else:
+        px = small.tobytes()  # One byte per pixel in mode L
+        dhash = 0
+        for row in range(8):
+            for col in range(8):
+                dhash = dhash << 1 | (px[row * 9 + col + 1] > px[row * 9 + col])
+        # Same Laplacian through Pillow's C filter, in 32-bit mode I (offset so negative
+        # responses survive) and without the border pixels the filter leaves unfiltered.
+        # ImageStat bins mode I into 256 buckets, so the variance is summed exactly here.
+        width, height = gray.size
+        laplacian = gray.convert("I").filter(
+            ImageFilter.Kernel((3, 3), (0, -1, 0, -1, 4, -1, 0, -1, 0), scale=1, offset=1024))
+        values = array.array("i", laplacian.crop((1, 1, width - 1, height - 1)).tobytes("raw", "I"))
+        count = max(1, len(values))
+        total = sum(values)
+        sharpness = (sum(value * value for value in values) - total * total / count) / count
+    return dhash, sharpness, brightness, clipped
+
+
+def quality_score(sharpness, brightness, clipped):
+    """Heuristic ranking score for versions of one image: sharp, well exposed, little clipping"""
+    return math.log1p(sharpness) * (1.0 - clipped) * (1.0 - abs(brightness - 128.0) / 256.0)
+
+
+def hamming_distances(hashes):
+    """Pairwise bit differences between 64-bit hashes, as a list of rows"""
+    np = _numpy()
+    if np is not None and len(hashes) > 1:
+        h = np.array(hashes, dtype=np.uint64)
+        xor = (h[:, None] ^ h[None, :]).astype(">u8")
+        return np.unpackbits(xor.view(np.uint8), axis=-1).reshape(len(hashes), len(hashes), 64).sum(-1).tolist()
+    return [[bin(a ^ b).count("1") for b in hashes] for a in hashes]
+
+
+def _probe_chunk(probe, tasks):
+    """
+    Process-pool worker for FileIndex.update(): for each (key, path, known mtime_ns, known
+    size) whose file changed, return (key, mtime_ns, size, probe(path) or None if the file
+    cannot be read)
+    """
+    results = []
+    for key, img_path, known_mtime_ns, known_size in tasks:
+        try:
+            stat = os.stat(img_path)
+        except OSError:
+            continue  # Removed since the catalog was built
+        if (stat.st_mtime_ns, stat.st_size) == (known_mtime_ns, known_size):
+            continue
+        try:
+            result = probe(img_path)
+        except Exception:  # Pillow raises many error types for damaged files
+            result = None
+        results.append((key, stat.st_mtime_ns, stat.st_size, result))
+    return results
+
+
+def _lower_priority():
+    """Process-pool initializer: run a background worker below the application's priority"""
+    try:
+        if hasattr(os, "nice"):
+            os.nice(BACKGROUND_NICENESS)
+        elif os.name == "nt":
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    except (OSError, AttributeError):
+        pass
+
+
+def map_chunks(worker, chunks, workers, is_cancelled=None, background=False):
+    """
+    Yield worker(chunk) for each chunk, in completion order. A single chunk runs in this
+    process (small updates, typically from the folder watcher, are not worth a process
+    pool); otherwise chunks run across worker processes with a bounded number in flight,
+    so huge folders do not queue millions of tasks. Stops early once is_cancelled() is true.
+    background lowers the worker processes' priority so they yield to the application.
+    """
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            yield worker(chunk)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers, initializer=_lower_priority if background else None) as executor:
+        chunk_iter = iter(chunks)
+        pending = {executor.submit(worker, chunk) for chunk in itertools.islice(chunk_iter, workers * 4)}
+        while pending:
+            if is_cancelled is not None and is_cancelled():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return
+            finished = next(as_completed(pending))
+            pending.discard(finished)
+            chunk = next(chunk_iter, None)
+            if chunk is not None:
+                pending.add(executor.submit(worker, chunk))
+            yield finished.result()
+
+
+class FileIndex:
+    """
+    Base of the per-file indexes of a master folder's image versions, persisted in SQLite
+    next to the catalog index and keyed on each file's mtime and size.
+
+    update() runs the subclass's probe on new and changed files across a process pool
+    (unchanged files cost one stat in a worker), so indexing scales with the number of
+    cores; in the background its workers run at lowered priority so they do not starve
+    the display. Subclasses supply the probe (a module-level function, so it can be
+    pickled), the columns it fills, and the mappings from a probe result to those columns
+    (row()) and from the leading MEMORY_COLUMNS of them to the in-memory entry (entry()).
+    """
+
+    NAME = None           # Used in log messages
+    SUFFIX = None         # Database file suffix, see CatalogIndex.path_for
+    TABLE = None
+    COLUMNS = ()          # (name, SQL type) of the columns after folder, name, mtime_ns, file_size
+    MEMORY_COLUMNS = None  # How many leading COLUMNS entry() needs (None for all)
+    VERSION = 0           # Bump to discard rows stored by an earlier probe
+    CHUNK = 64
+    DEFAULT_WORKERS = os.cpu_count() or 1
+    probe = None
+
+    def __init__(self, master_folder):
+        self.master_folder = master_folder
+        self.db_path = CatalogIndex.path_for(master_folder, self.SUFFIX)
+        self._entries = {}  # Structure: {(folder, image_name): (mtime_ns, file_size, *entry(...))}
+        self._lock = threading.Lock()  # One load or update at a time
+
+    def __len__(self):
+        return len(self._entries)
+
+    def row(self, result):
+        """Column values stored for a probe result"""
+        return tuple(result)
+
+    def entry(self, values):
+        """In-memory entry for the leading MEMORY_COLUMNS values of a row (all None if unreadable)"""
+        return tuple(values)
+
+    def _memory_columns(self):
+        return self.COLUMNS[:self.MEMORY_COLUMNS]
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+            conn.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+            conn.execute(f"PRAGMA user_version={self.VERSION}")
+        columns = "".join(f"{name} {sql_type}, " for name, sql_type in self.COLUMNS)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            "folder TEXT NOT NULL, name TEXT NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, file_size INTEGER NOT NULL, "
+            f"{columns}PRIMARY KEY (folder, name))")
+        return conn
+
+    def load(self):
+        """Read the stored entries into memory"""
+        columns = "".join(f", {name}" for name, _ in self._memory_columns())
+        try:
+            with self._lock, contextlib.closing(self._connect()) as conn:
+                for folder, name, mtime_ns, file_size, *values in conn.execute(
+                        f"SELECT folder, name, mtime_ns, file_size{columns} FROM {self.TABLE}"):
+                    self._entries[(folder, name)] = (mtime_ns, file_size, *self.entry(values))
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Error loading {self.NAME.lower()} index {self.db_path}: {str(e)}")
+        return self
+
+    def update(self, catalog, names=None, workers=None, progress=None, is_cancelled=None, background=True):
+        """
+        Probe the catalog's image versions (or only those of names) that are new or
+        changed. catalog should be a snapshot (ImageCatalog.copy()) when it is still being
+        modified elsewhere. Pass background=False when nothing interactive competes for
+        the cores. Returns the number of files probed.
+        """
+        workers = workers or self.DEFAULT_WORKERS
+        with self._lock:
+            tasks = []
+            for name in (catalog.names() if names is None else names):
+                for folder_index in catalog.versions(name):
+                    key = (catalog.folders[folder_index], name)
+                    known = self._entries.get(key, (None, None))
+                    tasks.append((key, catalog.path(name, folder_index), known[0], known[1]))
+            chunks = [tasks[i:i + self.CHUNK] for i in range(0, len(tasks), self.CHUNK)]
+            
+            computed = 0
+            done = 0
+            try:
+                with contextlib.closing(self._connect()) as conn:
+                    worker = functools.partial(_probe_chunk, type(self).probe)
+                    for results in map_chunks(worker, chunks, workers, is_cancelled, background):
+                        computed += self._store(conn, results)
+                        done += self.CHUNK
+                        if progress is not None:
+                            progress(min(done, len(tasks)), len(tasks))
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Error updating {self.NAME.lower()} index {self.db_path}: {str(e)}")
+        logger.info(f"{self.NAME} index for {self.master_folder}: {computed} of {len(tasks)} images probed")
+        return computed
+
+    def _store(self, conn, results):
+        """Record worker results in memory and in the database; returns how many there were"""
+        rows = []
+        memory_count = len(self._memory_columns())
+        for key, mtime_ns, file_size, result in results:
+            values = (None,) * len(self.COLUMNS) if result is None else self.row(result)
+            self._entries[key] = (mtime_ns, file_size, *self.entry(values[:memory_count]))
+            rows.append((*key, mtime_ns, file_size, *values))
+        if rows:
+            placeholders = ", ".join("?" * (4 + len(self.COLUMNS)))
+            conn.executemany(f"INSERT OR REPLACE INTO {self.TABLE} VALUES ({placeholders})", rows)
+            conn.commit()
+        return len(rows)
+
+
+class SimilarityIndex(FileIndex):
+    """
+    Perceptual hashes and quality scores (image_signature()) for every image version of a
+    master folder, used to group near-duplicate versions and rank versions by quality.
+    """
+
+    NAME = "Similarity"
+    SUFFIX = ".similarity.sqlite3"
+    TABLE = "signatures"
+    COLUMNS = (("dhash", "INTEGER"), ("sharpness", "REAL"), ("brightness", "REAL"), ("clipped", "REAL"))
+    VERSION = SIMILARITY_INDEX_VERSION
+    CHUNK = SIMILARITY_CHUNK
+    DEFAULT_WORKERS = DEFAULT_SIMILARITY_WORKERS
+    probe = staticmethod(image_signature)
+
+    def row(self, signature):
+        # SQLite integers are signed; hashes are stored modulo 2**64
+        dhash, sharpness, brightness, clipped = signature
+        return (dhash - 2**64 if dhash >= 2**63 else dhash, sharpness, brightness, clipped)
+
+    def entry(self, values):
+        """(dhash, quality score), both None for unreadable images"""
+        dhash, sharpness, brightness, clipped = values
+        if dhash is None:
+            return None, None
+        return dhash % 2**64, quality_score(sharpness, brightness, clipped)
+
+    def score(self, folder, image_name):
+        """Quality score of an image version, or None if it has not been analysed"""
+        entry = self._entries.get((folder, image_name))
+        return entry[3] if entry is not None else None
+
+    def version_groups(self, catalog, image_name):
+        """
+        Folder indices of image_name's versions grouped into near-duplicates. Each group is
+        ordered best first and groups are ordered by their best score; versions that have
+        not been analysed come last, each on its own, in folder order.
+        """
+        scored = []
+        unscored = []
+        for folder_index in catalog.versions(image_name):
+            entry = self._entries.get((catalog.folders[folder_index], image_name))
+            if entry is None or entry[2] is None:
+                unscored.append([folder_index])
+            else:
+                scored.append((entry[3], entry[2], folder_index))
+        scored.sort(key=lambda item: -item[0])
+        
+        # Greedy clustering: each version joins the first group whose best version is similar
+        distances = hamming_distances([dhash for _, dhash, _ in scored])
+        groups = []  # Structure: [(position of the group's best version in scored, [folder indices])]
+        for i, (_, _, folder_index) in enumerate(scored):
+            for leader, members in groups:
+                if distances[leader][i] <= DUPLICATE_HASH_DISTANCE:
+                    members.append(folder_index)
+                    break
+            else:
+                groups.append((i, [folder_index]))
+        return [members for _, members in groups] + unscored
+
+    def ranked_versions(self, catalog, image_name, collapse_duplicates=False):
+        """
+        Folder indices of image_name's versions, best first. With collapse_duplicates only
+        the best version of each group of near-duplicates is included.
+        """
+        groups = self.version_groups(catalog, image_name)
+        if collapse_duplicates:
+            return [members[0] for members in groups]
+        scores = {folder_index: self.score(catalog.folders[folder_index], image_name)
+                  for members in groups for folder_index in members}
+        return sorted(scores, key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i))
+
+    def best_version(self, catalog, image_name):
+        """Folder index of the highest scoring version, or None if none has been analysed"""
+        best = None
+        best_score = None
+        for folder_index in catalog.versions(image_name):
+            score = self.score(catalog.folders[folder_index], image_name)
+            if score is not None and (best_score is None or score > best_score):
+                best, best_score = folder_index, score
+        return best
+
+
+def _exif_text(value):
+    """Decode an EXIF text field to str ("" if absent); UserComment starts with an 8-byte character code"""
+    if isinstance(value, bytes):
+        code, data = value[:8], value[8:]
+        if code.startswith(b"UNICODE"):
+            # UTF-16 in either byte order; mostly-ASCII text reveals which by its zero bytes
+            value = data.decode("utf-16-be" if data[:1] == b"\0" else "utf-16-le", errors="replace")
+        elif code.startswith(b"ASCII") or code == b"\0" * 8:
+            value = data.decode("utf-8", errors="replace")
+        else:
+            value = value.decode("utf-8", errors="replace")
+    return value.strip("\0 \n") if isinstance(value, str) else ""
+
+
+def probe_image(img_path):
+    """
+    Read an image's dimensions, format, seed and generation text without decoding pixel
+    data: Image.open only parses the header (for PNG, up to the first image data chunk,
+    which is where generators write their text chunks); only load() would decode.
+    Returns (width, height, format, seed or None, text).
+    """
+    from PIL import Image
+    with Image.open(img_path) as img:
+        texts = [img.info[key] for key in GENERATION_TEXT_KEYS if isinstance(img.info.get(key), str)]
+        if "exif" in img.info:
+            exif = img.getexif()
+            for value in (exif.get_ifd(EXIF_IFD_TAG).get(EXIF_USER_COMMENT), exif.get(EXIF_IMAGE_DESCRIPTION)):
+                text = _exif_text(value)
+                if text:
+                    texts.append(text)
+        seed = None
+        for text in texts:
+            match = SEED_PATTERN.search(text)
+            if match:
+                seed = int(match.group(1))
+                break
+        return img.width, img.height, img.format, seed, texts[0][:METADATA_TEXT_LIMIT] if texts else ""
+
+
+def parse_image_filter(text):
+    """
+    Parse an image filter made of a minimum size such as "1024x1024" and/or a seed such
+    as "seed 1234" (e.g. "2048x0 seed:42"). Returns {"min_size": (width, height) or None,
+    "seed": int or None}; raises ValueError for anything else.
+    """
+    image_filter = {"min_size": None, "seed": None}
+    match = re.search(r"seed\s*[:=]?\s*(\d+)", text, re.IGNORECASE)
+    if match:
+        image_filter["seed"] = int(match.group(1))
+        text = text[:match.start()] + text[match.end():]
+    match = re.search(r"(\d+)\s*[x×]\s*(\d+)", text)
+    if match:
+        image_filter["min_size"] = (int(match.group(1)), int(match.group(2)))
+        text = text[:match.start()] + text[match.end():]
+    if text.strip():
+        raise ValueError(f"Unrecognised image filter: {text.strip()!r} (expected e.g. 1024x1024 or seed 1234)")
+    return image_filter
+
+
+class MetadataIndex(FileIndex):
+    """
+    Header metadata (probe_image()) of every image version of a master folder: dimensions,
+    format, seed and generation text such as the prompt, read without decoding any pixel
+    data. Dimensions, format and seed are kept in memory for layout, sorting and filtering;
+    the longer generation text stays in the database and is read on request.
+    """
+
+    NAME = "Metadata"
+    SUFFIX = ".metadata.sqlite3"
+    TABLE = "metadata"
+    COLUMNS = (("width", "INTEGER"), ("height", "INTEGER"), ("format", "TEXT"), ("seed", "TEXT"), ("text", "TEXT"))
+    MEMORY_COLUMNS = 4  # The generation text is read from the database on request
+    CHUNK = METADATA_CHUNK
+    DEFAULT_WORKERS = DEFAULT_METADATA_WORKERS
+    probe = staticmethod(probe_image)
+
+    def row(self, info):
+        # Seeds are stored as text since they can exceed SQLite's 64-bit signed integers
+        width, height, image_format, seed, text = info
+        return (width, height, image_format, None if seed is None else str(seed), text)
+
+    def entry(self, values):
+        """(width, height, format, seed), all None for unreadable headers"""
+        width, height, image_format, seed = values
+        return width, height, image_format, None if seed is None else int(seed)
+
+    def info(self, folder, image_name):
+        """(width, height, format, seed) of an image version, or None if its header is unknown"""
+        entry = self._entries.get((folder, image_name))
+        return entry[2:] if entry is not None and entry[2] is not None else None
+
+    def size(self, folder, image_name):
+        """(width, height) of an image version, or None if its header is unknown"""
+        entry = self._entries.get((folder, image_name))
+        return (entry[2], entry[3]) if entry is not None and entry[2] is not None else None
+
+    def text(self, folder, image_name):
+        """Generation text (prompt and parameters) of an image version, or None"""
+        try:
+            with contextlib.closing(self._connect()) as conn:
+                row = conn.execute("SELECT text FROM metadata WHERE folder = ? AND name = ?",
+                                   (folder, image_name)).fetchone()
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Error reading metadata index {self.db_path}: {str(e)}")
+            return None
+        return row[0] if row is not None else None
+
+    def sort_key(self, catalog, image_name, order):
+        """
+        Key for sorting image names by "resolution" (largest version first) or "seed"
+        (lowest seed of any version); names without that metadata sort last, by name
+        """
+        infos = [info for info in (self.info(catalog.folders[folder_index], image_name)
+                                   for folder_index in catalog.versions(image_name)) if info is not None]
+        if order == "resolution":
+            pixels = [width * height for width, height, _, _ in infos]
+            return (not pixels, -max(pixels, default=0), image_name)
+        seeds = [seed for _, _, _, seed in infos if seed is not None]
+        return (not seeds, min(seeds, default=0), image_name)
+
+    def sort_keys(self, catalog, names=None):
+        """
+        sort_key() of every image name (or of names) for each of METADATA_SORT_ORDERS, as
+        {order: {image_name: key}}; slow for large catalogs, so meant for background threads
+        """
+        names = catalog.names() if names is None else names
+        return {order: {name: self.sort_key(catalog, name, order) for name in names} for order in METADATA_SORT_ORDERS}
+
+    def matches(self, catalog, image_name, image_filter):
+        """Whether any version of image_name satisfies a parse_image_filter() result"""
+        min_width, min_height = image_filter["min_size"] or (0, 0)
+        seed = image_filter["seed"]
+        for folder_index in catalog.versions(image_name):
+            info = self.info(catalog.folders[folder_index], image_name)
+            if (info is not None and info[0] >= min_width and info[1] >= min_height
+                    and (seed is None or info[3] == seed)):
+                return True
+        return False
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process in bytes, or None if unavailable"""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        if os.name == "nt":
+            import ctypes
+            from ctypes import wintypes
+            
+            class ProcessMemoryCounters(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            
+            counters = ProcessMemoryCounters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        import resource
+        # Peak rather than current RSS, which is the best the portable API offers
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (OSError, ValueError, AttributeError, ImportError):
+        return None
+
+
+class PerfRecorder:
+    """
+    Optional hot-path instrumentation: timed spans, counters and async intervals, kept as
+    running statistics and as Chrome trace events (viewable in chrome://tracing or Perfetto).
+
+    When disabled, span() returns a shared no-op context and the other methods return
+    immediately, so instrumented code pays only for the call.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._events = deque(maxlen=PERF_MAX_EVENTS)
+        self._stats = {}     # Structure: {name: [count, total_seconds, max_seconds, last_seconds]}
+        self._counters = {}  # Structure: {name: latest value}
+        self._open = {}      # Structure: {(name, id): start time} for async intervals
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _timestamp_us(self, t):
+        return round((t - self._origin) * 1e6, 1)
+
+    def _add(self, name, seconds):
+        """Fold a duration into the running statistics (lock held)"""
+        stat = self._stats.get(name)
+        if stat is None:
+            self._stats[name] = [1, seconds, seconds, seconds]
+        else:
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+            stat[3] = seconds
+
+    def span(self, name, **args):
+        """Context manager timing a block of code"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, args)
+
+    @contextlib.contextmanager
+    def _span(self, name, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {"name": name, "ph": "X", "ts": self._timestamp_us(start),
+                     "dur": round((end - start) * 1e6, 1), "pid": os.getpid(), "tid": threading.get_ident()}
+            if args:
+                event["args"] = args
+            with self._lock:
+                self._events.append(event)
+                self._add(name, end - start)
+
+    def counter(self, name, value):
+        """Record the current value of a counter such as a queue depth"""
+        if not self.enabled:
+            return
+        event = {"name": name, "ph": "C", "ts": self._timestamp_us(time.perf_counter()),
+                 "pid": os.getpid(), "args": {name: value}}
+        with self._lock:
+            self._events.append(event)
+            self._counters[name] = value
+
+    def begin(self, name, interval_id):
+        """Start an interval that ends on another call path (e.g. keypress to pixels)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._open[(name, interval_id)] = time.perf_counter()
+
+    def is_open(self, name, interval_id):
+        """Whether an interval has begun and not yet ended"""
+        with self._lock:
+            return (name, interval_id) in self._open
+
+    def end(self, name, interval_id):
+        """Finish an interval started with begin(); unknown intervals are ignored"""
+        if not self.enabled:
+            return
+        end = time.perf_counter()
+        with self._lock:
+            start = self._open.pop((name, interval_id), None)
+            if start is None:
+                return
+            common = {"name": name, "cat": "async", "id": interval_id, "pid": os.getpid()}
+            self._events.append({**common, "ph": "b", "ts": self._timestamp_us(start)})
+            self._events.append({**common, "ph": "e", "ts": self._timestamp_us(end)})
+            self._add(name, end - start)
+
+    def discard(self, name, interval_id):
+        """Abandon an interval without recording it (e.g. superseded by a newer one)"""
+        with self._lock:
+            self._open.pop((name, interval_id), None)
+
+    def stats(self, name):
+        """(count, mean seconds, max seconds, last seconds) for a span or interval, or None"""
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                return None
+            return stat[0], stat[1] / stat[0], stat[2], stat[3]
+
+    def counter_value(self, name, default=None):
+        """Latest value recorded for a counter"""
+        with self._lock:
+            return self._counters.get(name, default)
+
+    def reset(self):
+        """Drop all recorded events and statistics"""
+        with self._lock:
+            self._events.clear()
+            self._stats.clear()
+            self._counters.clear()
+            self._open.clear()
+
+    def export_chrome_trace(self, path):
+        """Write recorded events in Chrome trace-event JSON format"""
+        with self._lock:
+            events = list(self._events)
+        events.extend({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread.ident,
+                       "args": {"name": thread.name}} for thread in threading.enumerate())
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+# Process-wide recorder (enable with SLIDE_CHOOSER_PERF=1 or from the GUI's View menu)
+perf = PerfRecorder(enabled=os.environ.get("SLIDE_CHOOSER_PERF", "") not in ("", "0"))
+
+
+class ImageCache:
+    """
+    Thread-safe LRU cache bounded by an approximate byte budget.
+
+    Each entry carries a size tag (the display size it was rendered for). When the
+    active display size changes, entries for other sizes are moved to the cold end
+    of the LRU order so they are evicted before anything rendered for the current size.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # Structure: {key: (value, size_tag, nbytes)}
+        self._active_size = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        """Return the cached value for key (or None), updating LRU order and counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes, size_tag=None):
+        """Store a value and evict least recently used entries until within budget"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[2]
+            self._entries[key] = (value, size_tag, nbytes)
+            self.total_bytes += nbytes
+            self._evict()
+
+    def discard(self, key):
+        """Remove a single entry if present"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[2]
+
+    def discard_if(self, predicate):
+        """Remove every entry whose key satisfies predicate; returns how many were removed"""
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                self.total_bytes -= self._entries.pop(key)[2]
+            return len(stale)
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def set_active_size(self, size_tag):
+        """Mark the display size currently in use so other sizes are evicted first"""
+        with self._lock:
+            if size_tag == self._active_size:
+                return
+            self._active_size = size_tag
+            stale = [key for key, entry in self._entries.items()
+                     if entry[1] is not None and entry[1] != size_tag]
+            for key in reversed(stale):
+                self._entries.move_to_end(key, last=False)
+
+    def _evict(self):
+        """Evict from the cold end of the LRU order until within budget (lock held)"""
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self.total_bytes > self.budget_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry[2]
+            self.evictions += 1
+            logger.debug(f"Evicted {key} from image cache ({entry[2]} bytes)")
+
+    def stats_text(self):
+        """Short human-readable summary for the status bar"""
+        lookups = self.hits + self.misses
+        hit_rate = (100.0 * self.hits / lookups) if lookups else 0.0
+        return (f"Cache: {self.total_bytes / 2**20:.0f}/{self.budget_bytes / 2**20:.0f} MB, "
+                f"{hit_rate:.0f}% hits, {self.evictions} evicted")
+
+
+def fit_size(size, box):
+    """Largest size with the aspect ratio of size that fits within box (never upscaled)"""
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+
+def letterbox(img, size, background):
+    """Return an RGB image of exactly size with img centred on a background colour"""
+    from PIL import Image
+    canvas = Image.new("RGB", size, background)
+    offset = ((size[0] - img.width) // 2, (size[1] - img.height) // 2)
+    canvas.paste(img, offset, img if img.mode == "RGBA" else None)
+    return canvas
+
+
+class ImagePyramid:
+    """
+    An image decoded once into power-of-two levels (largest first).
+
+    Display sizes are resampled from the smallest level that is still at least as large
+    as the requested size, so a window resize never has to touch the original file again.
+    """
+
+    def __init__(self, levels, original_size, complete=True, stored=False):
+        self.levels = levels
+        self.original_size = original_size
+        self.complete = complete  # False when the largest level is smaller than the original
+        self.stored = stored  # Built from a lossy stored preview: fine for a first paint only
+
+    @classmethod
+    def from_file(cls, img_path, max_dim=PYRAMID_MAX_DIM):
+        """
+        Decode an image file into a pyramid whose largest level fits within max_dim. The
+        pyramid is only complete when that level is the original size; otherwise covers()
+        tells whether it has enough detail for a given box.
+        """
+        from PIL import Image
+        with Image.open(img_path) as img:
+            original_size = img.size
+            base_size = fit_size(img.size, (max_dim, max_dim))
+            if img.format == "JPEG":
+                # DCT-domain downscale: decode directly at 1/2, 1/4 or 1/8 scale when possible
+                img.draft("RGB", base_size)
+            if img.mode not in ("RGB", "RGBA", "L"):
+                has_alpha = img.mode in ("LA", "PA", "RGBa", "La") or "transparency" in img.info
+                img = img.convert("RGBA" if has_alpha else "RGB")
+            else:
+                img.load()
+
+            # Cheap power-of-two box reduction first, then an exact resample down to the base size
+            factor = 1
+            while img.width // (factor * 2) >= base_size[0] and img.height // (factor * 2) >= base_size[1]:
+                factor *= 2
+            if factor > 1:
+                img = img.reduce(factor)
+            if img.size != base_size:
+                img = img.resize(base_size, Image.Resampling.LANCZOS)
+        return cls.from_image(img, original_size, base_size == original_size)
+
+    @classmethod
+    def from_image(cls, img, original_size, complete=True, stored=False):
+        """Build the lower levels of a pyramid from an already decoded base image"""
+        levels = [img]
+        while max(levels[-1].size) // 2 >= PYRAMID_MIN_DIM:
+            levels.append(levels[-1].reduce(2))
+        return cls(levels, original_size, complete, stored)
+
+    def covers(self, box):
+        """Whether box can be rendered without needing more detail than this pyramid holds"""
+        if self.complete:
+            return True
+        # Allow one pixel of rounding slack between the stored preview and the target
+        target = fit_size(self.original_size, box)
+        return self.levels[0].width + 1 >= target[0] and self.levels[0].height + 1 >= target[1]
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by all levels"""
+        return sum(level.width * level.height * len(level.getbands()) for level in self.levels)
+
+    def render(self, box, fast=False):
+        """
+        Return a copy of the image scaled to fit within box (never upscaled). fast uses
+        nearest-neighbour sampling, for previews shown while the window is being resized.
+        """
+        from PIL import Image
+        base = self.levels[0]
+        target = fit_size(base.size, box)
+        
+        # Resample from the nearest level that is at least as large as the target
+        source = base
+        for level in self.levels:
+            if level.width >= target[0] and level.height >= target[1]:
+                source = level
+            else:
+                break
+        if source.size == target:
+            return source.copy()
+        return source.resize(target, Image.Resampling.NEAREST if fast else Image.Resampling.LANCZOS)
+
+
+class ThumbnailStore:
+    """
+    Persistent SQLite store of compact image previews.
+
+    Entries are keyed by (path, size bucket) and validated against the file's mtime and
+    size on every read, so previews of modified or replaced files are dropped automatically.
+    The store is kept within budget_bytes by pruning the least recently used previews.
+    """
+
+    def __init__(self, db_path, budget_bytes=DEFAULT_THUMBNAIL_BUDGET_MB * 2**20):
+        self.db_path = db_path
+        self.budget_bytes = budget_bytes
+        self._conn = None
+        self._disabled = False
+        self._lock = threading.Lock()
+        self._format = None  # Chosen on first write, once Pillow is imported
+        self._total_bytes = 0  # Preview bytes stored, counted on open and kept up to date by put()
+
+    @staticmethod
+    def bucket_for(box):
+        """Smallest bucket that can hold an image displayed within box"""
+        for bucket in THUMBNAIL_BUCKETS:
+            if bucket >= max(box):
+                return bucket
+        return None  # Larger than any stored preview
+
+    def _connect(self):
+        """Open the database on first use (lock held)"""
+        if self._conn is None and not self._disabled:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                if self._conn.execute("PRAGMA user_version").fetchone()[0] != THUMBNAIL_SCHEMA_VERSION:
+                    # Previews can always be rebuilt, so an older layout is simply discarded
+                    self._conn.execute("DROP TABLE IF EXISTS thumbnails")
+                    self._conn.execute(f"PRAGMA user_version={THUMBNAIL_SCHEMA_VERSION}")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS thumbnails ("
+                    "path TEXT NOT NULL, bucket INTEGER NOT NULL, "
+                    "mtime_ns INTEGER NOT NULL, file_size INTEGER NOT NULL, "
+                    "width INTEGER NOT NULL, height INTEGER NOT NULL, "
+                    "data BLOB NOT NULL, accessed INTEGER NOT NULL, PRIMARY KEY (path, bucket))")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_accessed ON thumbnails (accessed)")
+                self._conn.commit()
+                self._total_bytes = self._conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails").fetchone()[0]
+            except (OSError, sqlite3.Error) as e:
+                logger.error(f"Thumbnail store disabled, cannot open {self.db_path}: {str(e)}")
+                self._disabled = True
+                self._conn = None
+        return self._conn
+
+    def get(self, img_path, stat, bucket):
+        """Return (preview image, original size) if a fresh entry exists, otherwise None"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT mtime_ns, file_size, width, height, data, accessed FROM thumbnails "
+                    "WHERE path = ? AND bucket = ?", (img_path, bucket)).fetchone()
+                if row is None:
+                    return None
+                if (row[0], row[1]) != (stat.st_mtime_ns, stat.st_size):
+                    # The original changed since the preview was stored
+                    conn.execute("DELETE FROM thumbnails WHERE path = ?", (img_path,))
+                    conn.commit()
+                    return None
+                now = int(time.time())
+                if row[5] < now - THUMBNAIL_TOUCH_SECONDS:
+                    conn.execute("UPDATE thumbnails SET accessed = ? WHERE path = ? AND bucket = ?",
+                                 (now, img_path, bucket))
+                    conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error reading thumbnail for {img_path}: {str(e)}")
+                return None
+        from PIL import Image
+        img = Image.open(io.BytesIO(row[4]))
+        img.load()
+        return img, (row[2], row[3])
+
+    def put(self, img_path, stat, bucket, img, original_size):
+        """Encode and store a preview for the given bucket"""
+        if self._format is None:
+            from PIL import features
+            self._format = "WEBP" if features.check("webp") else "JPEG"
+        buffer = io.BytesIO()
+        if self._format == "WEBP":
+            img.save(buffer, "WEBP", quality=85, method=3)
+        else:
+            img.convert("RGB").save(buffer, "JPEG", quality=85)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (img_path, bucket, stat.st_mtime_ns, stat.st_size,
+                     original_size[0], original_size[1], buffer.getvalue(), int(time.time())))
+                conn.commit()
+                self._total_bytes += buffer.tell()
+                if self._total_bytes > self.budget_bytes:
+                    self._prune(conn)
+            except sqlite3.Error as e:
+                logger.error(f"Error storing thumbnail for {img_path}: {str(e)}")
+
+    def _prune(self, conn):
+        """Delete the least recently used previews until the store is back under budget (lock held)"""
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM thumbnails").fetchone()[0]
+        target = int(self.budget_bytes * THUMBNAIL_PRUNE_TARGET)
+        doomed = []
+        for rowid, size in conn.execute("SELECT rowid, LENGTH(data) FROM thumbnails ORDER BY accessed"):
+            if total <= target:
+                break
+            doomed.append((rowid,))
+            total -= size
+        conn.executemany("DELETE FROM thumbnails WHERE rowid = ?", doomed)
+        conn.commit()
+        self._total_bytes = total
+        logger.info(f"Pruned {len(doomed)} least recently used thumbnails from {self.db_path}")
+
+
+class DecodePool:
+    """
+    Fixed pool of decode threads fed from a shared priority queue.
+
+    Pillow releases the GIL while decoding and resampling, so threads decode in parallel.
+    Files above the process threshold can instead be decoded in a worker process.
+    """
+
+    def __init__(self, workers, process_threshold_bytes=0):
+        self.workers = workers
+        self.process_threshold_bytes = process_threshold_bytes
+        self._jobs = queue.PriorityQueue()
+        self._order = itertools.count()  # FIFO tie-breaker within a priority
+        self._active = 0  # Jobs queued or running
+        self._threads = []
+        self._process_pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, priority=PRIORITY_VISIBLE):
+        """Queue fn(*args) to run on a decode thread; lower priorities run first"""
+        with self._lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._worker, name=f"decode-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._active += 1
+        self._jobs.put((priority, next(self._order), fn, args))
+        perf.counter("decode_queue", self._jobs.qsize())
+
+    def busy(self):
+        """Whether any job is queued or still running"""
+        with self._lock:
+            return self._active > 0
+
+    def wants_process(self, file_size):
+        """Whether a file of this size should be decoded in a worker process"""
+        return 0 < self.process_threshold_bytes <= file_size
+
+    def run_in_process(self, fn, *args):
+        """Run a picklable fn(*args) in the process pool and wait for its result"""
+        with self._lock:
+            if self._process_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self._process_pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._process_pool.submit(fn, *args).result()
+
+    def _worker(self):
+        """Decode thread main loop"""
+        while True:
+            _, _, fn, args = self._jobs.get()
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.error(f"Unhandled error in decode job: {str(e)}", exc_info=True)
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def shutdown(self):
+        """Stop the process pool, if one was started"""
+        with self._lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+
+
+class LoadScheduler:
+    """
+    Tracks which image each display slot (e.g. a slide frame) currently wants.
+
+    Every request is tagged with a new generation number. Requests for the same
+    (path, size) job key are coalesced into one decode job, and a job is dropped before
+    decoding, or its result discarded afterwards, once no slot still wants it.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.dropped_before_decode = 0
+        self.dropped_after_decode = 0
+        self._wanted = {}  # Structure: {slot: (generation, job_key)}
+        self._jobs = {}    # Structure: {job_key: set of slots} for jobs queued or in flight
+        self._lock = threading.Lock()
+
+    def request(self, slot, job_key):
+        """
+        Record that slot now wants job_key, superseding its previous request.
+        Returns the request's generation, or None if an existing job already covers it.
+        """
+        with self._lock:
+            self.generation += 1
+            self._wanted[slot] = (self.generation, job_key)
+            waiting = self._jobs.get(job_key)
+            if waiting is not None:
+                waiting.add(slot)
+                return None
+            self._jobs[job_key] = {slot}
+            return self.generation
+
+    def cancel(self, slot):
+        """Forget what slot wants, e.g. because it was served from the cache"""
+        with self._lock:
+            self._wanted.pop(slot, None)
+
+    def _slots_wanting(self, job_key):
+        """Slots that still want job_key (lock held)"""
+        return [slot for slot in self._jobs.get(job_key, ())
+                if slot in self._wanted and self._wanted[slot][1] == job_key]
+
+    def is_waiting(self, slot):
+        """Whether slot still waits for a requested image"""
+        with self._lock:
+            return slot in self._wanted
+
+    def claim(self, job_key, decoded=False):
+        """
+        Return True if some slot still wants job_key; otherwise drop the job so a later
+        request for the same key starts a fresh one
+        """
+        with self._lock:
+            if self._slots_wanting(job_key):
+                return True
+            self._jobs.pop(job_key, None)
+            if decoded:
+                self.dropped_after_decode += 1
+            else:
+                self.dropped_before_decode += 1
+            return False
+
+    def finish(self, job_key):
+        """Complete a job and return the slots its result should be delivered to"""
+        with self._lock:
+            slots = self._slots_wanting(job_key)
+            self._jobs.pop(job_key, None)
+            for slot in slots:
+                del self._wanted[slot]
+            return slots
+
+
+class ImageLoader:
+    """
+    Decoding side of the image pipeline: the pyramid cache, the persistent thumbnail
+    store and the decode pool, configured from the environment.
+    """
+
+    def __init__(self):
+        pyramid_budget_mb = env_int("SLIDE_CHOOSER_PYRAMID_MB", DEFAULT_PYRAMID_BUDGET_MB)
+        self.pyramid_cache = ImageCache(pyramid_budget_mb * 2**20)
+        self.pyramid_max_dim = env_int("SLIDE_CHOOSER_PYRAMID_MAX", PYRAMID_MAX_DIM)
+        self.thumbnail_store = ThumbnailStore(
+            os.path.join(user_cache_dir(), THUMBNAIL_DB_NAME),
+            env_int("SLIDE_CHOOSER_THUMBNAIL_MB", DEFAULT_THUMBNAIL_BUDGET_MB) * 2**20)
+        self._pending_stores = 0
+        self._pending_lock = threading.Lock()
+        self.decode_pool = DecodePool(
+            env_int("SLIDE_CHOOSER_DECODE_WORKERS", DEFAULT_DECODE_WORKERS),
+            env_int("SLIDE_CHOOSER_PROCESS_DECODE_MB", DEFAULT_PROCESS_DECODE_MB) * 2**20)
+
+    def get_pyramid(self, img_path, img_size, decode_dim=None, preview=True):
+        """
+        Return a pyramid detailed enough to render img_size, trying the memory cache,
+        then the persistent thumbnail store, and only then decoding the original file.
+
+        decode_dim caps the size decoded from the original (for small thumbnails); the
+        resulting pyramid is replaced once a larger size is requested. Stored previews
+        are lossy (check pyramid.stored); pass preview=False to require the original.
+        """
+        pyramid = self.pyramid_cache.get(img_path)
+        if pyramid is not None and pyramid.covers(img_size) and (preview or not pyramid.stored):
+            return pyramid
+        
+        stat = os.stat(img_path)
+        bucket = ThumbnailStore.bucket_for(img_size)
+        if bucket is not None and preview:
+            with perf.span("thumbnail_read"):
+                stored = self.thumbnail_store.get(img_path, stat, bucket)
+            if stored is not None:
+                thumbnail, original_size = stored
+                pyramid = ImagePyramid.from_image(thumbnail, original_size, complete=False, stored=True)
+                if pyramid.covers(img_size):
+                    self.pyramid_cache.put(img_path, pyramid, pyramid.nbytes)
+                    return pyramid
+        
+        # Slides larger than the usual cap get a pyramid as large as they are
+        max_dim = max(self.pyramid_max_dim, *img_size)
+        if decode_dim is not None:
+            max_dim = min(max_dim, decode_dim)
+        with perf.span("decode", path=img_path, bytes=stat.st_size):
+            if self.decode_pool.wants_process(stat.st_size):
+                pyramid = self.decode_pool.run_in_process(ImagePyramid.from_file, img_path, max_dim)
+            else:
+                pyramid = ImagePyramid.from_file(img_path, max_dim)
+        self.pyramid_cache.put(img_path, pyramid, pyramid.nbytes)
+        if bucket is not None and self._reserve_store():
+            # Encoding and committing the preview would delay the caller's pixels, so it is
+            # queued behind the decodes that something is waiting for
+            self.decode_pool.submit(self.store_thumbnail, img_path, stat, bucket, pyramid, priority=PRIORITY_STORE)
+        return pyramid
+
+    def _reserve_store(self):
+        """Claim one of the THUMBNAIL_PENDING_WRITES slots for a queued preview write"""
+        with self._pending_lock:
+            if self._pending_stores >= THUMBNAIL_PENDING_WRITES:
+                return False
+            self._pending_stores += 1
+            return True
+
+    def store_thumbnail(self, img_path, stat, bucket, pyramid):
+        """Save a decoded image's preview for the given bucket in the thumbnail store (pool thread)"""
+        try:
+            with perf.span("thumbnail_write"):
+                self.thumbnail_store.put(img_path, stat, bucket, pyramid.render((bucket, bucket)),
+                                         pyramid.original_size)
+        finally:
+            with self._pending_lock:
+                self._pending_stores -= 1
+
+    def render(self, img_path, img_size, decode_dim=None, preview=True):
+        """Return the image at img_path scaled to fit within img_size"""
+        pyramid = self.get_pyramid(img_path, img_size, decode_dim, preview)
+        with perf.span("resample"):
+            return pyramid.render(img_size)
+
+    def preview(self, img_path, img_size):
+        """Fast low-quality render from an already decoded pyramid (None if it is not in memory)"""
+        pyramid = self.pyramid_cache.get(img_path)
+        if pyramid is None:
+            return None
+        with perf.span("preview"):
+            return pyramid.render(img_size, fast=True)
+
+    def shutdown(self):
+        """Release worker processes"""
+        self.decode_pool.shutdown()
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled by the user"""
+
+
+def zip_compression_for(arcname, mode):
+    """Return (compress_type, compresslevel) for an archive member under a compression mode"""
+    import zipfile
+    if mode == "stored" or (mode == "auto" and arcname.lower().endswith(PRECOMPRESSED_EXTENSIONS)):
+        return zipfile.ZIP_STORED, None
+    if mode == "zstd":
+        return zipfile.ZIP_ZSTANDARD, None
+    return zipfile.ZIP_DEFLATED, EXPORT_DEFLATE_LEVEL
+
+
+def export_zip(items, export_path, mode="auto", progress=None, cancel_event=None,
+               read_workers=EXPORT_READ_WORKERS):
+    """
+    Write (arcname, path) items into a ZIP archive and return the number of files written.
+
+    Files are read on a thread pool a bounded number of items ahead of the single archive
+    writer, so slow storage is read in parallel while memory use stays bounded. Missing
+    files are skipped. The partial archive is removed if the export fails or is cancelled.
+    """
+    import zipfile
+    
+    def read_entry(arcname, path):
+        zinfo = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        data = None
+        if zinfo.file_size <= EXPORT_STREAM_BYTES:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return zinfo, path, data
+    
+    total = len(items)
+    written = 0
+    executor = ThreadPoolExecutor(max_workers=read_workers)
+    try:
+        with zipfile.ZipFile(export_path, 'w', allowZip64=True) as zipf:
+            pending = deque()
+            remaining = iter(items)
+            for done in range(1, total + 1):
+                # Keep the readers a bounded number of files ahead of the writer
+                for arcname, path in itertools.islice(remaining, EXPORT_READ_AHEAD - len(pending)):
+                    pending.append(executor.submit(read_entry, arcname, path))
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                
+                try:
+                    zinfo, path, data = pending.popleft().result()
+                except OSError as e:
+                    logger.warning(f"Skipping file that could not be read during export: {str(e)}")
+                else:
+                    zinfo.compress_type, level = zip_compression_for(zinfo.filename, mode)
+                    if data is not None:
+                        zipf.writestr(zinfo, data, compresslevel=level)
+                    else:
+                        with open(path, 'rb') as src, zipf.open(zinfo, 'w') as dest:
+                            shutil.copyfileobj(src, dest, 2**20)
+                    written += 1
+                if progress is not None:
+                    progress(done, total)
+    except BaseException:
+        executor.shutdown(wait=True, cancel_futures=True)
+        try:
+            os.remove(export_path)
+        except OSError:
+            pass
+        raise
+    executor.shutdown()
+    return written
+
+
+def reflink(src, dst):
+    """
+    Clone src to dst so that both share the same data blocks until either is modified
+    (Btrfs, XFS and APFS among others). Raises OSError where this is not supported.
+    """
+    if sys.platform.startswith("linux"):
+        import fcntl
+        FICLONE = 0x40049409
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+            except OSError as e:
+                dst_file.close()
+                os.remove(dst)
+                raise OSError(e.errno, e.strerror, dst) from None
+        shutil.copystat(src, dst)
+    elif sys.platform == "darwin":
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+    else:
+        raise OSError(errno.ENOTSUP, "Reflinks are not supported on this platform", dst)
+
+
+def export_temp_path(dst):
+    """
+    Fresh path next to dst to build an export file under before it is renamed over dst.
+    Writing into an existing dst would write through a hardlink left by an earlier link
+    export, into the original image in the master folder.
+    """
+    tmp_path = f"{dst}.tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)  # Left by an interrupted export, and possibly a hardlink itself
+    return tmp_path
+
+
+def place_file(src, dst, method="copy"):
+    """Put src at dst using one of EXPORT_COPY_METHODS and return how it was placed"""
+    # A hardlink to the source from an earlier export is what a link export wants anyway;
+    # a copy or a reflink must not leave the export sharing the original's inode
+    if method in ("link", "hardlink") and os.path.exists(dst) and os.path.samefile(src, dst):
+        return "existing"
+    tmp_path = export_temp_path(dst)
+    try:
+        placed = _place_new_file(src, tmp_path, method)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return placed
+
+
+def _place_new_file(src, dst, method):
+    """Create dst (which does not exist) from src and return how it was placed"""
+    if method in ("link", "reflink"):
+        try:
+            reflink(src, dst)
+            return "reflink"
+        except OSError:
+            if method == "reflink":
+                raise
+    if method in ("link", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            if method == "hardlink":
+                raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def export_copy(items, dest_dir, progress=None, cancel_event=None, workers=EXPORT_COPY_WORKERS, method="copy"):
+    """
+    Place (name, path) items into dest_dir in parallel and return the number of files placed.
+
+    method is one of EXPORT_COPY_METHODS; links make an export of any size near-instant
+    and use no extra disk space, but a hardlinked file is the original, so editing it
+    edits the original too. Missing files are skipped; files already placed are left in
+    place if cancelled.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    
+    def copy_entry(name, path):
+        if cancel_event is not None and cancel_event.is_set():
+            return False
+        place_file(path, os.path.join(dest_dir, name), method)
+        return True
+    
+    total = len(items)
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(copy_entry, name, path) for name, path in items]
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                written += future.result()
+            except OSError as e:
+                logger.warning(f"Skipping file that could not be copied during export: {str(e)}")
+            if progress is not None:
+                progress(done, total)
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+    return written
+
+
+def _transcode_file(task):
+    """
+    Process-pool worker: for a (src, dst, pil_format, max_dim, quality) task, write a
+    downscaled, re-encoded copy of src to dst; returns an error message or None
+    """
+    src, dst, pil_format, max_dim, quality = task
+    try:
+        from PIL import Image
+        with Image.open(src) as img:
+            size = fit_size(img.size, (max_dim, max_dim))
+            if img.format == "JPEG":
+                img.draft("RGB", size)
+            icc_profile = img.info.get("icc_profile")
+            has_alpha = img.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in img.info
+            if pil_format == "JPEG" or img.mode not in ("RGB", "RGBA", "L"):
+                img = img.convert("RGBA" if has_alpha and pil_format != "JPEG" else "RGB")
+            if img.size != size:
+                img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            options = {"quality": quality} if pil_format in ("WEBP", "JPEG") else {}
+            if icc_profile:
+                options["icc_profile"] = icc_profile
+            tmp_path = export_temp_path(dst)
+            try:
+                img.save(tmp_path, pil_format, **options)
+                os.replace(tmp_path, dst)
+            except BaseException:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return None
+    except Exception as e:  # Pillow raises many error types for damaged files
+        return f"{src}: {str(e)}"
+
+
+def export_transcoded(items, dest_dir, image_format="webp", max_dim=TRANSCODE_MAX_DIM, quality=TRANSCODE_QUALITY,
+                      progress=None, cancel_event=None, workers=DEFAULT_TRANSCODE_WORKERS):
+    """
+    Write resized, re-encoded copies of (name, path) items into dest_dir and return the
+    number of files written.
+
+    Images are converted across worker processes, one file per task (see map_chunks).
+    Output names get the extension of image_format (a TRANSCODE_FORMATS key); images
+    that cannot be converted are skipped.
+    """
+    extension, pil_format = TRANSCODE_FORMATS[image_format]
+    os.makedirs(dest_dir, exist_ok=True)
+    tasks = []
+    used_names = set()
+    for name, path in items:
+        out_name = os.path.splitext(name)[0] + extension
+        if out_name in used_names:
+            out_name = name + extension  # e.g. both image.png and image.jpg were selected
+        used_names.add(out_name)
+        tasks.append((path, os.path.join(dest_dir, out_name), pil_format, max_dim, quality))
+    
+    total = len(tasks)
+    written = 0
+    done = 0
+    is_cancelled = cancel_event.is_set if cancel_event is not None else None
+    for error in map_chunks(_transcode_file, tasks, workers, is_cancelled):
+        if error is None:
+            written += 1
+        else:
+            logger.warning(f"Skipping file that could not be converted during export: {error}")
+        done += 1
+        if progress is not None:
+            progress(done, total)
+    if is_cancelled is not None and is_cancelled():
+        raise ExportCancelled()
+    return written
+
+
+def load_selection(path):
+    """
+    Read a selection file into {image_name: folder_name}.
+
+    JSON files hold that mapping directly. Any other file is read as text with one
+    "folder/image_name" entry per line; blank lines and lines starting with # are ignored.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError(f"{path} does not contain a JSON object")
+            return {str(name): str(folder) for name, folder in data.items()}
+        selection = {}
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            folder, sep, name = line.replace("\\", "/").rpartition("/")
+            if not sep or not folder or not name:
+                raise ValueError(f"{path}:{line_number}: expected folder/image_name, got {line!r}")
+            selection[name] = folder
+        return selection
+
+
+def save_selection(selection, path):
+    """Write {image_name: folder_name} as JSON, or as folder/image_name lines for other extensions"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            json.dump(selection, f, indent=1, sort_keys=True)
+        else:
+            for name in sorted(selection):
+                f.write(f"{selection[name]}/{name}\n")
+    os.replace(tmp_path, path)
+
+
+class SelectionJournal:
+    """
+    Write-ahead journal of a master folder's selection, so review work survives a crash
+    and is restored when the folder is opened again.
+
+    Each change is appended as a JSON line by a background writer thread, which writes
+    everything queued since its previous pass and then fsyncs once, so rapid clicking
+    costs the caller one queue put per change. The log is compacted into a single
+    snapshot record once it grows well beyond the selection itself, and on close.
+    """
+
+    def __init__(self, master_folder):
+        self.master_folder = master_folder
+        self.path = CatalogIndex.path_for(master_folder, ".selection.jsonl")
+        self._queue = queue.Queue()  # Change dicts, or None to stop the writer
+        self._state = {}  # Selection as written so far (writer thread only once started)
+        self._records = 0  # Records in the file since the last snapshot
+        self._damaged = False
+        self._file = None
+        self._thread = None
+
+    def load(self):
+        """Replay the journal, start the writer and return the selection it records"""
+        state = {}
+        records = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        kind, payload = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write; the records before it are intact
+                        logger.warning(f"Ignoring damaged record {line_number} in {self.path}")
+                        self._damaged = True
+                        continue
+                    if not line.endswith("\n"):
+                        self._damaged = True  # Appending would run into this record
+                    if kind == "snapshot":
+                        state = dict(payload)
+                    else:
+                        for name, folder in payload.items():
+                            if folder is None:
+                                state.pop(name, None)
+                            else:
+                                state[name] = folder
+                    records += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Error reading selection journal {self.path}: {str(e)}")
+        self._state = state
+        self._records = records
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return dict(state)
+
+    def record(self, changes):
+        """Queue {image_name: folder_name, or None when deselected} to be journaled"""
+        if changes:
+            self._queue.put(dict(changes))
+
+    def close(self):
+        """Write everything still queued, compact the log and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        """Writer thread: group-commit queued changes and compact when the log gets long"""
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            try:
+                if self._damaged:
+                    self._compact()
+                changes = [item for item in batch if item is not None]
+                if changes:
+                    self._append(changes)
+                if self._records > 1 and (stopping or self._records >= max(JOURNAL_COMPACT_RECORDS,
+                                                                            2 * len(self._state))):
+                    self._compact()
+            except OSError as e:
+                logger.error(f"Error writing selection journal {self.path}: {str(e)}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _append(self, changes):
+        """Append one record per change dict and fsync them together"""
+        lines = []
+        for change in changes:
+            for name, folder in change.items():
+                if folder is None:
+                    self._state.pop(name, None)
+                else:
+                    self._state[name] = folder
+            lines.append(json.dumps(["update", change], separators=(",", ":")))
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._records += len(lines)
+
+    def _compact(self):
+        """Atomically replace the log with a single snapshot of the current selection"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(["snapshot", self._state], separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._records = 1
+        self._damaged = False
+
+
+def selection_items(catalog, selection):
+    """Resolve a selection into (image_name, path) pairs, skipping entries the catalog lacks"""
+    items = []
+    for name, folder in selection.items():
+        img_path = catalog.path(name, catalog.folder_index(folder))
+        if img_path:
+            items.append((name, img_path))
+        else:
+            logger.warning(f"Selected image {name} is not present in folder {folder}")
+    return items
@@ -0,0 +1,32 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep persistent data (indexes, journals, thumbnails) out of the user's cache directory"""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("SLIDE_CHOOSER_CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def master(tmp_path):
+    """A master folder with batch folders b0..b2 of small solid-colour PNGs; b1 lacks img2"""
+    from PIL import Image
+
+    root = tmp_path / "master"
+    for folder_index in range(3):
+        folder = root / f"b{folder_index}"
+        folder.mkdir(parents=True)
+        for image_index in range(3):
+            if (folder_index, image_index) == (1, 2):
+                continue
+            colour = (80 * folder_index, 60 * image_index, 128)
+            Image.new("RGB", (64, 48), colour).save(folder / f"img{image_index}.png")
+    return root
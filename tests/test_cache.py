@@ -0,0 +1,56 @@
+# tests/test_cache.py
+from slide_core import ImageCache
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ImageCache(30)
+    for key in "abc":
+        cache.put(key, key.upper(), 10)
+    assert cache.get("a") == "A"
+    cache.put("d", "D", 10)
+    assert "b" not in cache
+    assert [key for key in "acd" if key in cache] == ["a", "c", "d"]
+    assert cache.total_bytes == 30 and cache.evictions == 1
+
+
+def test_replacing_an_entry_updates_its_size():
+    cache = ImageCache(30)
+    cache.put("a", "A", 10)
+    cache.put("a", "A2", 25)
+    assert cache.total_bytes == 25 and len(cache) == 1
+    assert cache.get("a") == "A2"
+
+
+def test_newest_entry_is_kept_even_over_budget():
+    cache = ImageCache(10)
+    cache.put("a", "A", 5)
+    cache.put("big", "BIG", 50)
+    assert "a" not in cache
+    assert cache.get("big") == "BIG"
+
+
+def test_other_sizes_are_demoted_when_the_active_size_changes():
+    cache = ImageCache(40)
+    cache.set_active_size((800, 600))
+    cache.put("untagged", "u", 10)
+    cache.put("old1", "1", 10, size_tag=(800, 600))
+    cache.put("old2", "2", 10, size_tag=(800, 600))
+    cache.set_active_size((1024, 768))
+    cache.put("new1", "n1", 10, size_tag=(1024, 768))
+    cache.put("new2", "n2", 10, size_tag=(1024, 768))
+    cache.put("new3", "n3", 10, size_tag=(1024, 768))
+    # Both entries for the old size go before the older, untagged one
+    assert "old1" not in cache and "old2" not in cache
+    assert all(key in cache for key in ("untagged", "new1", "new2", "new3"))
+
+
+def test_discard_if_and_hit_rate():
+    cache = ImageCache(100)
+    cache.put(("/m/a.png", 10, 10), "a", 10)
+    cache.put(("/m/b.png", 10, 10), "b", 10)
+    assert cache.discard_if(lambda key: key[0] == "/m/a.png") == 1
+    assert cache.total_bytes == 10
+    assert cache.get(("/m/a.png", 10, 10)) is None
+    assert cache.get(("/m/b.png", 10, 10)) == "b"
+    assert cache.hits == 1 and cache.misses == 1
+    assert "50% hits" in cache.stats_text()
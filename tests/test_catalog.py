@@ -0,0 +1,65 @@
+# tests/test_catalog.py
+from slide_core import ImageCatalog
+
+
+def make_catalog():
+    catalog = ImageCatalog("/master")
+    catalog.add("b", ["x", "y"])
+    catalog.add("d", ["x", "z"])
+    return catalog
+
+
+def test_insert_folder_renumbers_later_folders():
+    catalog = make_catalog()
+    assert catalog.insert_folder("c") == 1
+    assert catalog.folders == ["b", "c", "d"]
+    catalog.add("c", ["y"])
+    assert catalog.versions("x") == [0, 2]
+    assert catalog.versions("y") == [0, 1]
+    assert catalog.versions("z") == [2]
+    assert catalog.path("z", 2).replace("\\", "/") == "/master/d/z"
+
+
+def test_insert_folder_at_front_and_existing():
+    catalog = make_catalog()
+    assert catalog.insert_folder("a") == 0
+    assert catalog.versions("x") == [1, 2]
+    assert catalog.folder_index("d") == 2
+    assert catalog.insert_folder("d") == 2
+    assert catalog.folders == ["a", "b", "d"]
+
+
+def test_remove_folder_renumbers_and_drops_orphans():
+    catalog = make_catalog()
+    catalog.insert_folder("c")
+    catalog.add("c", ["y", "w"])
+    catalog.remove_folder("b")
+    assert catalog.folders == ["c", "d"]
+    assert catalog.folder_index("d") == 1
+    assert catalog.versions("x") == [1]
+    assert catalog.versions("y") == [0]
+    assert catalog.versions("w") == [0]
+    catalog.remove_folder("c")
+    assert sorted(catalog.names()) == ["x", "z"]
+    assert "y" not in catalog and "w" not in catalog
+    catalog.remove_folder("missing")
+    assert catalog.folders == ["d"]
+
+
+def test_next_folder_wraps_and_skips_gaps():
+    catalog = make_catalog()
+    catalog.insert_folder("c")
+    assert catalog.next_folder("x", 0, 1) == 2
+    assert catalog.next_folder("x", 2, 1) == 0
+    assert catalog.next_folder("x", 0, -1) == 2
+    assert catalog.next_folder("missing", 0, 1) is None
+
+
+def test_discard_drops_versions_and_orphaned_names():
+    catalog = make_catalog()
+    snapshot = catalog.copy()
+    catalog.discard(0, ["x", "y", "missing"])
+    assert catalog.versions("x") == [1]
+    assert "y" not in catalog
+    assert catalog.folder_names(0) == []
+    assert snapshot.versions("x") == [0, 1] and "y" in snapshot
@@ -0,0 +1,73 @@
+# tests/test_export.py
+import os
+import zipfile
+
+import pytest
+from PIL import Image
+
+from slide_core import EXPORT_COPY_METHODS, export_copy, export_transcoded, export_zip
+
+
+def items_from(master, folder):
+    return [(name, str(master / folder / name)) for name in ("img0.png", "img1.png")]
+
+
+def test_export_zip(master, tmp_path):
+    archive = tmp_path / "out.zip"
+    assert export_zip(items_from(master, "b0"), str(archive)) == 2
+    with zipfile.ZipFile(archive) as zipf:
+        assert sorted(zipf.namelist()) == ["img0.png", "img1.png"]
+        assert zipf.read("img1.png") == (master / "b0" / "img1.png").read_bytes()
+
+
+@pytest.mark.parametrize("method", EXPORT_COPY_METHODS)
+def test_export_copy_methods(master, tmp_path, method):
+    out = tmp_path / "out"
+    try:
+        written = export_copy(items_from(master, "b0"), str(out), method=method)
+    except OSError:
+        pytest.skip(f"{method} is not supported here")
+    if method == "reflink" and not written:
+        pytest.skip("reflinks are not supported on this filesystem")
+    assert written == 2
+    assert (out / "img0.png").read_bytes() == (master / "b0" / "img0.png").read_bytes()
+
+
+def test_export_transcoded_resizes_and_renames(master, tmp_path):
+    out = tmp_path / "out"
+    assert export_transcoded(items_from(master, "b0"), str(out), "webp", max_dim=32, workers=1) == 2
+    assert sorted(os.listdir(out)) == ["img0.webp", "img1.webp"]
+    with Image.open(out / "img0.webp") as img:
+        assert img.format == "WEBP"
+        assert img.size == (32, 24)
+
+
+@pytest.mark.parametrize("second_export", ["copy", "reflink", "transcode"])
+def test_export_over_linked_files_leaves_originals_intact(master, tmp_path, second_export):
+    out = tmp_path / "out"
+    originals = {name: (master / "b0" / name).read_bytes() for name in ("img0.png", "img1.png")}
+    assert export_copy(items_from(master, "b0"), str(out), method="hardlink") == 2
+
+    if second_export == "transcode":
+        export_transcoded(items_from(master, "b2"), str(out), "png", max_dim=16, workers=1)
+    else:
+        export_copy(items_from(master, "b2"), str(out), method=second_export)
+
+    for name, data in originals.items():
+        assert (master / "b0" / name).read_bytes() == data
+    assert not [name for name in os.listdir(out) if name.endswith(".tmp")]
+    if second_export != "reflink":
+        assert (out / "img1.png").read_bytes() != originals["img1.png"]
+
+
+@pytest.mark.parametrize("method", ["copy", "reflink"])
+def test_copy_over_a_link_export_of_the_same_source_breaks_the_link(master, tmp_path, method):
+    out = tmp_path / "out"
+    items = items_from(master, "b0")
+    assert export_copy(items, str(out), method="hardlink") == 2
+    if not export_copy(items, str(out), method=method):
+        pytest.skip(f"{method} is not supported on this filesystem")
+
+    for name, path in items:
+        assert not os.path.samefile(out / name, path)
+        assert (out / name).read_bytes() == (master / "b0" / name).read_bytes()
@@ -0,0 +1,49 @@
+# tests/test_indexes.py
+import os
+
+from PIL import Image
+
+from slide_core import ImageCatalog, MetadataIndex, SimilarityIndex
+
+
+def scan(master):
+    catalog = ImageCatalog(str(master))
+    for folder in sorted(os.listdir(master)):
+        catalog.add(folder, os.listdir(master / folder))
+    return catalog
+
+
+def test_metadata_index_round_trip(master):
+    Image.new("RGB", (64, 48)).save(master / "b2" / "img0.png",
+                                    pnginfo=_text_chunk("parameters", "a lighthouse, Seed: 18446744073709551615"))
+    (master / "b2" / "broken.png").write_bytes(b"not an image")
+    catalog = scan(master)
+
+    index = MetadataIndex(str(master))
+    index.CHUNK = 2  # Several chunks, so they run in worker processes
+    assert index.update(catalog, workers=2) == 9
+    assert index.update(catalog, workers=2) == 0
+
+    reloaded = MetadataIndex(str(master)).load()
+    assert len(reloaded) == 9
+    assert reloaded.info("b2", "img0.png") == (64, 48, "PNG", 2**64 - 1)
+    assert reloaded.info("b2", "broken.png") is None
+    assert "lighthouse" in reloaded.text("b2", "img0.png")
+
+
+def test_similarity_index_round_trip(master):
+    catalog = scan(master)
+    index = SimilarityIndex(str(master))
+    assert index.update(catalog, workers=1) == 8
+    reloaded = SimilarityIndex(str(master)).load()
+    assert len(reloaded) == 8
+    assert reloaded.score("b0", "img1.png") == index.score("b0", "img1.png")
+    assert sorted(reloaded.ranked_versions(catalog, "img2.png")) == [0, 2]
+
+
+def _text_chunk(key, value):
+    from PIL import PngImagePlugin
+
+    info = PngImagePlugin.PngInfo()
+    info.add_text(key, value)
+    return info
@@ -0,0 +1,46 @@
+# tests/test_journal.py
+import json
+import os
+
+from slide_core import SelectionJournal
+
+
+def test_changes_are_replayed_on_reopen(tmp_path):
+    journal = SelectionJournal(str(tmp_path))
+    assert journal.load() == {}
+    journal.record({"a.png": "b0", "b.png": "b1"})
+    journal.record({"a.png": "b2"})
+    journal.record({"b.png": None})
+    journal.close()
+
+    journal = SelectionJournal(str(tmp_path))
+    assert journal.load() == {"a.png": "b2"}
+    journal.close()
+
+
+def test_torn_last_line_is_skipped_and_repaired(tmp_path):
+    journal = SelectionJournal(str(tmp_path))
+    os.makedirs(os.path.dirname(journal.path))
+    with open(journal.path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(["snapshot", {"a.png": "b0"}]) + "\n")
+        f.write(json.dumps(["update", {"b.png": "b1"}]) + "\n")
+        f.write('["update",{"c.png":"b')
+    assert journal.load() == {"a.png": "b0", "b.png": "b1"}
+    journal.record({"d.png": "b2"})
+    journal.close()
+
+    with open(journal.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert records == [["snapshot", {"a.png": "b0", "b.png": "b1", "d.png": "b2"}]]
+
+
+def test_close_compacts_into_one_snapshot(tmp_path):
+    journal = SelectionJournal(str(tmp_path))
+    journal.load()
+    for index in range(20):
+        journal.record({f"img{index}.png": "b0"})
+    journal.close()
+    with open(journal.path, encoding="utf-8") as f:
+        lines = f.readlines()
+    assert len(lines) == 1
+    assert len(json.loads(lines[0])[1]) == 20
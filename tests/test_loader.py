@@ -0,0 +1,93 @@
+# tests/test_loader.py
+import time
+
+from slide_core import ImageLoader, ImagePyramid
+
+
+def wait_idle(loader):
+    while loader.decode_pool.busy():
+        time.sleep(0.01)
+
+
+def test_pyramid_outlives_its_closed_file(master):
+    # At full size the base level is the opened image itself, used after the file is closed
+    pyramid = ImagePyramid.from_file(str(master / "b0" / "img0.png"))
+    assert pyramid.render((64, 48)).size == (64, 48)
+    assert pyramid.render((32, 24)).size == (32, 24)
+
+
+def test_slides_larger_than_the_pyramid_cap_keep_their_detail(tmp_path, monkeypatch):
+    from PIL import Image
+
+    path = str(tmp_path / "wide.png")
+    Image.effect_noise((200, 100), 40).convert("RGB").save(path)
+    monkeypatch.setenv("SLIDE_CHOOSER_PYRAMID_MAX", "64")
+    loader = ImageLoader()
+    small = loader.get_pyramid(path, (60, 60))
+    assert small.levels[0].size == (64, 32) and not small.complete
+    assert not small.covers((150, 150))
+    assert loader.render(path, (150, 150)).size == (150, 75)
+    assert loader.get_pyramid(path, (200, 200)).complete
+    wait_idle(loader)
+
+
+def test_preview_writes_beyond_the_pending_limit_are_dropped(master, monkeypatch):
+    import slide_core
+
+    monkeypatch.setattr(slide_core, "THUMBNAIL_PENDING_WRITES", 1)
+    loader = ImageLoader()
+    loader._pending_stores = 1  # A write is already waiting
+    loader.get_pyramid(str(master / "b0" / "img0.png"), (40, 30))
+    assert not loader.decode_pool.busy()
+
+    loader._pending_stores = 0
+    loader.get_pyramid(str(master / "b0" / "img1.png"), (40, 30))
+    wait_idle(loader)
+    assert loader._pending_stores == 0
+    restarted = ImageLoader()
+    assert restarted.get_pyramid(str(master / "b0" / "img1.png"), (40, 30)).stored
+    assert not restarted.get_pyramid(str(master / "b0" / "img0.png"), (40, 30)).stored
+    wait_idle(restarted)
+
+
+def test_stored_preview_is_flagged_and_original_can_be_required(master):
+    path = str(master / "b0" / "img1.png")
+    loader = ImageLoader()
+    assert not loader.get_pyramid(path, (40, 30)).stored
+    wait_idle(loader)
+
+    restarted = ImageLoader()
+    pyramid = restarted.get_pyramid(path, (40, 30))
+    assert pyramid.stored
+    assert restarted.get_pyramid(path, (40, 30)) is pyramid
+    original = restarted.get_pyramid(path, (40, 30), preview=False)
+    assert not original.stored and original.complete
+    assert restarted.get_pyramid(path, (40, 30)) is original
+
+
+def test_thumbnail_store_prunes_least_recently_used(tmp_path, monkeypatch):
+    from PIL import Image
+
+    import slide_core
+    from slide_core import ThumbnailStore
+
+    clock = iter(range(1_000_000, 2_000_000, 10_000))
+    monkeypatch.setattr(slide_core.time, "time", lambda: next(clock))
+    paths = []
+    for index in range(8):
+        path = tmp_path / f"img{index}.png"
+        Image.effect_noise((64, 64), 40 + index).convert("RGB").save(path)
+        paths.append(str(path))
+
+    store = ThumbnailStore(str(tmp_path / "thumbs.sqlite3"))
+    preview = Image.effect_noise((256, 256), 60).convert("RGB")
+    store.put(paths[0], slide_core.os.stat(paths[0]), 256, preview, (64, 64))
+    store.budget_bytes = store._total_bytes * 3
+    for path in paths[1:]:
+        store.put(path, slide_core.os.stat(path), 256, preview, (64, 64))
+        store.get(paths[1], slide_core.os.stat(paths[1]), 256)  # Keep img1 recently used
+
+    assert 0 < store._total_bytes <= store.budget_bytes
+    assert store.get(paths[0], slide_core.os.stat(paths[0]), 256) is None
+    assert store.get(paths[1], slide_core.os.stat(paths[1]), 256) is not None
+    assert store.get(paths[-1], slide_core.os.stat(paths[-1]), 256) is not None
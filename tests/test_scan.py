@@ -0,0 +1,85 @@
+# tests/test_scan.py
+import os
+import time
+
+import pytest
+
+import slide_core
+from slide_core import CatalogIndex, build_catalog, scan_master_folder
+
+
+def age_folders(master, seconds=3600):
+    """Move the batch folders' mtimes into the past, out of the racy window"""
+    past = time.time() - seconds
+    for folder in master.iterdir():
+        os.utime(folder, (past, past))
+
+
+@pytest.fixture
+def listed(monkeypatch):
+    """Records the folders that are actually listed (rather than taken from the index)"""
+    folders = []
+    scan_image_folder = slide_core.scan_image_folder
+
+    def record(folder_path):
+        folders.append(os.path.basename(folder_path))
+        return scan_image_folder(folder_path)
+    monkeypatch.setattr(slide_core, "scan_image_folder", record)
+    return folders
+
+
+def test_scan_publishes_folders_then_batches(master):
+    events = list(scan_master_folder(str(master), workers=2))
+    assert events[0] == ("folders", ["b0", "b1", "b2"])
+    batches = dict(payload for kind, payload in events[1:])
+    assert [kind for kind, _ in events[1:]] == ["batch"] * 3
+    assert sorted(batches["b1"]) == ["img0.png", "img1.png"]
+    catalog = build_catalog(str(master))
+    assert catalog.versions("img2.png") == [0, 2]
+
+
+def test_unchanged_folders_reuse_the_index(master, listed):
+    age_folders(master)
+    build_catalog(str(master))
+    assert sorted(listed) == ["b0", "b1", "b2"]
+    listed.clear()
+    catalog = build_catalog(str(master))
+    assert listed == []
+    assert catalog.versions("img2.png") == [0, 2]
+
+    # A changed folder is listed again; the others still come from the index
+    (master / "b1" / "img2.png").write_bytes((master / "b0" / "img2.png").read_bytes())
+    past = time.time() - 1800
+    os.utime(master / "b1", (past, past))
+    catalog = build_catalog(str(master))
+    assert listed == ["b1"]
+    assert catalog.versions("img2.png") == [0, 1, 2]
+
+
+def test_racy_mtimes_are_not_trusted(master, listed):
+    # Folders modified just before the scan might change again within the same mtime tick
+    build_catalog(str(master))
+    listed.clear()
+    build_catalog(str(master))
+    assert sorted(listed) == ["b0", "b1", "b2"]
+
+    index = CatalogIndex(str(master), {"b0": (1000, ["x"])}, scanned_at_ns=1000 + slide_core.RACY_MTIME_NS + 1)
+    assert index.lookup("b0", 1000) == ["x"]
+    assert index.lookup("b0", 999) is None
+    index.scanned_at_ns = 1000 + slide_core.RACY_MTIME_NS
+    assert index.lookup("b0", 1000) is None
+
+
+def test_index_round_trips_and_ignores_other_versions(master, monkeypatch):
+    index = CatalogIndex(str(master), {"b0": (5, ["a.png"])}, scanned_at_ns=10**12)
+    index.save()
+    loaded = CatalogIndex.load(str(master))
+    assert loaded.folders == {"b0": (5, ["a.png"])}
+    assert loaded.scanned_at_ns == 10**12
+    monkeypatch.setattr(slide_core, "CATALOG_INDEX_VERSION", slide_core.CATALOG_INDEX_VERSION + 1)
+    assert CatalogIndex.load(str(master)).folders == {}
+
+
+def test_master_folder_without_subfolders_is_an_error(tmp_path):
+    with pytest.raises(ValueError):
+        build_catalog(str(tmp_path))
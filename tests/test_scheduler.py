@@ -0,0 +1,30 @@
+# tests/test_scheduler.py
+from slide_core import LoadScheduler
+
+
+def test_requests_for_the_same_job_are_coalesced():
+    scheduler = LoadScheduler()
+    assert scheduler.request("left", ("a.png", (100, 100))) is not None
+    assert scheduler.request("right", ("a.png", (100, 100))) is None
+    assert scheduler.claim(("a.png", (100, 100)))
+    assert sorted(scheduler.finish(("a.png", (100, 100)))) == ["left", "right"]
+    assert not scheduler.is_waiting("left")
+
+
+def test_superseded_job_is_dropped_before_decoding():
+    scheduler = LoadScheduler()
+    scheduler.request("left", ("a.png", (100, 100)))
+    scheduler.request("left", ("b.png", (100, 100)))
+    assert not scheduler.claim(("a.png", (100, 100)))
+    assert scheduler.dropped_before_decode == 1
+    assert scheduler.claim(("b.png", (100, 100)))
+    assert scheduler.finish(("b.png", (100, 100))) == ["left"]
+
+
+def test_cancelled_job_is_dropped_after_decoding_and_can_restart():
+    scheduler = LoadScheduler()
+    scheduler.request("left", ("a.png", (100, 100)))
+    scheduler.cancel("left")
+    assert not scheduler.claim(("a.png", (100, 100)), decoded=True)
+    assert scheduler.dropped_after_decode == 1
+    assert scheduler.request("left", ("a.png", (100, 100))) is not None
@@ -0,0 +1,26 @@
+# tests/test_similarity.py
+from PIL import Image
+
+import slide_core
+
+
+def exact_laplacian_variance(gray):
+    width, height = gray.size
+    pixels = gray.tobytes()
+    values = []
+    for y in range(1, height - 1):
+        for x in range(1, width - 1):
+            i = y * width + x
+            values.append(4 * pixels[i] - pixels[i - width] - pixels[i + width] - pixels[i - 1] - pixels[i + 1])
+    mean = sum(values) / len(values)
+    return sum((value - mean) ** 2 for value in values) / len(values)
+
+
+def test_pillow_sharpness_matches_the_unclipped_laplacian(tmp_path, monkeypatch):
+    monkeypatch.setattr(slide_core, "_numpy", lambda: None)
+    path = tmp_path / "noise.png"
+    Image.effect_noise((120, 80), 90).convert("L").save(path)
+    _, sharpness, _, _ = slide_core.image_signature(str(path))
+    with Image.open(path) as img:
+        expected = exact_laplacian_variance(img.convert("L"))
+    assert abs(sharpness - expected) < 1e-6 * expected
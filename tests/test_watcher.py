@@ -0,0 +1,136 @@
+# tests/test_watcher.py
+import os
+import sys
+import threading
+import time
+import types
+
+import slide_core
+from slide_core import FolderWatcher, ImageCache, _WatchHandler, build_catalog
+
+
+def age_folders(master, seconds=3600):
+    """Move the batch folders' mtimes into the past, so the catalog index trusts them"""
+    past = time.time() - seconds
+    for folder in master.iterdir():
+        os.utime(folder, (past, past))
+
+
+def watcher_for(master, on_change=None):
+    age_folders(master)
+    catalog = build_catalog(str(master))
+    return FolderWatcher(str(master), catalog.folders, on_change or (lambda listings, modified: None))
+
+
+def test_changes_between_scan_and_watch_are_detected(master):
+    watcher = watcher_for(master)
+    assert watcher._changed_since_scan() == set()
+    (master / "b3").mkdir()
+    (master / "b0" / "img3.png").write_bytes((master / "b0" / "img0.png").read_bytes())
+    assert watcher._changed_since_scan() == {"b0", "b3"}
+
+
+def test_poll_reports_changed_added_and_removed_folders(master):
+    watcher = watcher_for(master)
+    watcher._changed_since_scan()
+    assert watcher._poll() == set()
+    (master / "b1" / "img0.png").unlink()
+    for name in os.listdir(master / "b2"):
+        (master / "b2" / name).unlink()
+    (master / "b2").rmdir()
+    (master / "b4").mkdir()
+    assert watcher._poll() == {"b1", "b2", "b4"}
+    assert watcher._poll() == set()
+
+
+def test_publish_lists_changed_folders_again(master):
+    published = []
+    watcher = watcher_for(master, lambda listings, modified: published.append((listings, modified)))
+    (master / "b1" / "img0.png").unlink()
+    watcher._publish({"b1", "gone"}, {("b0", "img0.png"), ("gone", "img0.png")})
+    listings, modified = published[0]
+    assert listings == {"b1": ["img1.png"], "gone": None}
+    assert modified == set()  # Only pairs in folders that were listed (and still have images)
+    watcher._publish({"b0"}, {("b0", "img0.png")})
+    assert published[1][1] == {("b0", "img0.png")}
+
+
+def test_watch_handler_maps_events_to_folders(master):
+    events = slide_core.queue.Queue()
+    handler = _WatchHandler(str(master), events)
+
+    def event(kind, path, is_directory=False):
+        return types.SimpleNamespace(event_type=kind, src_path=str(path), is_directory=is_directory)
+    handler.dispatch(event("created", master / "b0" / "new.png"))
+    handler.dispatch(event("modified", master / "b1" / "img0.png"))
+    handler.dispatch(event("opened", master / "b1" / "img1.png"))
+    handler.dispatch(event("created", master / "b0" / "notes.txt"))
+    handler.dispatch(event("deleted", master / "b2", is_directory=True))
+    received = []
+    while not events.empty():
+        received.append(events.get())
+    assert received == [("b0", None), ("b1", "img0.png"), ("b2", None)]
+
+
+def test_polling_watcher_publishes_a_debounced_batch(master, monkeypatch):
+    monkeypatch.setattr(slide_core, "WATCH_DEBOUNCE_MS", 20)
+    published = []
+    changed = threading.Event()
+
+    def on_change(listings, modified):
+        published.append(listings)
+        changed.set()
+    watcher = watcher_for(master, on_change)
+    watcher.poll_interval = 0.02
+    monkeypatch.setitem(sys.modules, "watchdog", None)  # Force polling
+    watcher.start()
+    try:
+        time.sleep(0.1)
+        (master / "b1" / "img2.png").write_bytes((master / "b0" / "img2.png").read_bytes())
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+    assert watcher.mode == "polling"
+    assert sorted(published[0]["b1"]) == ["img0.png", "img1.png", "img2.png"]
+
+
+def make_app(master):
+    """The parts of SlideChooser that apply_folder_changes uses, with the GUI stubbed out"""
+    from slide_chooser import SlideChooser
+
+    catalog = build_catalog(str(master))
+    app = types.SimpleNamespace(
+        image_catalog=catalog, folders=catalog.folders, master_folder=str(master),
+        slides_per_view=types.SimpleNamespace(get=lambda: 1), slide_frames=[],
+        image_cache=ImageCache(2**20), loader=types.SimpleNamespace(pyramid_cache=ImageCache(2**20)),
+        image_names=[], selected_images={}, journal=None, similarity=None,
+        status_var=types.SimpleNamespace(set=lambda text: None), merged=set(), indexed=None)
+    app.merge_scanned_names = app.merged.update
+    app.update_cache_status = lambda: None
+    app.start_image_index = lambda names: setattr(app, "indexed", names)
+    for method in ("apply_folder_changes", "journal_selection", "default_folder_index"):
+        setattr(app, method, getattr(SlideChooser, method).__get__(app))
+    return app
+
+
+def test_apply_folder_changes_merges_listings_and_drops_stale_state(master):
+    app = make_app(master)
+    removed = (os.path.join(str(master), "b0", "img0.png"), 10, 10)
+    kept = (os.path.join(str(master), "b0", "img1.png"), 10, 10)
+    in_removed_folder = (os.path.join(str(master), "b2", "img1.png"), 10, 10)
+    for key in (removed, kept, in_removed_folder):
+        app.image_cache.put(key, key[0], 1)
+    app.selected_images = {"img0.png": "b0", "img1.png": "b2", "img2.png": "b0"}
+
+    app.apply_folder_changes({"b0": ["img1.png", "img2.png", "img9.png"], "b2": None, "b3": ["img0.png"]}, set())
+
+    catalog = app.image_catalog
+    assert catalog.folders == ["b0", "b1", "b3"]
+    assert catalog.versions("img0.png") == [1, 2]
+    assert catalog.versions("img9.png") == [0]
+    assert catalog.versions("img2.png") == [0]  # b2's copy went with the folder
+    assert app.selected_images == {"img2.png": "b0"}  # Selections of removed versions are dropped
+    assert kept in app.image_cache
+    assert removed not in app.image_cache and in_removed_folder not in app.image_cache
+    assert app.merged == {"img0.png", "img1.png", "img2.png", "img9.png"}
+    assert app.indexed == {"img0.png", "img1.png", "img2.png", "img9.png"}